@@ -0,0 +1,78 @@
+"""Compares the serialization of touch events, run with
+`python benchmarks/control_message.py`."""
+
+import timeit
+
+import symmetrical_doodle.android.input
+import symmetrical_doodle.control_message
+import symmetrical_doodle.coords
+
+# a multi-finger gesture at 240 Hz, for one second
+FINGERS = 5
+RATE = 240
+
+
+def write_be(buf: bytearray, value: int, size: int):
+    buf.extend(value.to_bytes(size, "big"))
+
+
+def serialize_appending(message: symmetrical_doodle.control_message.InjectTouchEvent):
+    """The previous implementation, one append per field."""
+    buf = bytearray([message.type.value])
+    buf.append(message.action.value)
+    write_be(buf, message.pointer_id, 8)
+    write_be(buf, message.position.point.x, 4)
+    write_be(buf, message.position.point.y, 4)
+    write_be(buf, message.position.screen_size.width, 2)
+    write_be(buf, message.position.screen_size.height, 2)
+    pressure = symmetrical_doodle.control_message.to_fixed_point_16(message.pressure)
+    write_be(buf, pressure, 2)
+    write_be(buf, message.buttons, 4)
+    return buf
+
+
+def create_messages():
+    screen_size = symmetrical_doodle.coords.Size(1080, 1920)
+    return [
+        symmetrical_doodle.control_message.InjectTouchEvent(
+            action=symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_MOVE,
+            buttons=0,
+            pointer_id=finger,
+            position=symmetrical_doodle.coords.Position(
+                screen_size, symmetrical_doodle.coords.Point(100 + i, 200 + finger)
+            ),
+            pressure=1.0,
+        )
+        for i in range(RATE)
+        for finger in range(FINGERS)
+    ]
+
+
+def main():
+    messages = create_messages()
+    serializer = symmetrical_doodle.control_message.Serializer()
+
+    assert b"".join(map(serialize_appending, messages)) == serializer.serialize(
+        messages
+    )
+
+    # joined, as the messages are sent with a single write
+    candidates = {
+        "append per field": lambda: b"".join(
+            [serialize_appending(m) for m in messages]
+        ),
+        "struct per message": lambda: b"".join([m.serialize() for m in messages]),
+        "struct batch": lambda: serializer.serialize(messages),
+    }
+    number = 100
+    baseline = None
+    for name, function in candidates.items():
+        elapsed = min(timeit.repeat(function, number=number, repeat=5)) / number
+        per_message = elapsed / len(messages) * 1e9
+        if baseline is None:
+            baseline = elapsed
+        print(f"{name:20} {per_message:8.1f} ns/message {baseline / elapsed:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
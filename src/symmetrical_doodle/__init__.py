@@ -1 +1,23 @@
+import importlib
+
 __version__ = "0.1.0"
+
+# the submodules which import av, numpy or PySide6 are only imported on first
+# attribute access, which keeps the startup (and --help) fast
+LAZY_SUBMODULES = frozenset(
+    (
+        "converters",
+        "decoders",
+        "delay_buffers",
+        "demuxers",
+        "packets",
+        "recorders",
+        "shared_frames",
+    )
+)
+
+
+def __getattr__(name: str):
+    if name in LAZY_SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
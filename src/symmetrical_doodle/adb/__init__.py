@@ -2,7 +2,8 @@ import asyncio
 import asyncio.subprocess
 import dataclasses
 import shutil
-from typing import Optional
+from collections.abc import Awaitable
+from typing import Optional, Protocol
 
 
 def get_executable():
@@ -21,6 +22,29 @@ class CompletedProcess:
     pid: int
 
 
+class Process(Protocol):
+    """The part of asyncio.subprocess.Process used by the callers of
+    run_command, so that subclasses can run commands without a local process.
+    """
+
+    @property
+    def returncode(self) -> Optional[int]: ...
+
+    @property
+    def pid(self) -> int: ...
+
+    @property
+    def stdout(self) -> Optional[asyncio.StreamReader]: ...
+
+    async def wait(self) -> int: ...
+
+    async def communicate(
+        self, input: None = None
+    ) -> tuple[Optional[bytes], Optional[bytes]]: ...
+
+    def kill(self) -> None: ...
+
+
 @dataclasses.dataclass
 class SimpleADB:
     program: str = dataclasses.field(default_factory=get_executable)
@@ -37,7 +61,7 @@ class SimpleADB:
         stderr=None,
         limit=None,
         **kwds,
-    ):
+    ) -> Awaitable[Process]:
         args = self.get_args(command)
         if limit is None:
             return asyncio.create_subprocess_exec(
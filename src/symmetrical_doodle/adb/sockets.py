@@ -0,0 +1,485 @@
+import asyncio
+import asyncio.subprocess
+import dataclasses
+import logging
+import os
+import pathlib
+import stat
+import struct
+import sys
+from collections.abc import Awaitable
+from typing import Optional, TextIO
+
+import symmetrical_doodle.adb
+import symmetrical_doodle.utils.conection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADB_SERVER_PORT = 5037
+
+OKAY = b"OKAY"
+FAIL = b"FAIL"
+
+# the sync protocol messages: id, length (or a single value)
+SYNC_HEADER = struct.Struct("<4sI")
+# mode, size, mtime
+SYNC_STAT = struct.Struct("<III")
+SYNC_DATA_MAX = 64 * 1024
+
+# the shell protocol v2 packets: id, length
+SHELL_HEADER = struct.Struct("<BI")
+SHELL_STDOUT = 1
+SHELL_STDERR = 2
+SHELL_EXIT = 3
+
+
+def get_default_port():
+    return int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_ADB_SERVER_PORT))
+
+
+def encode_request(request: str):
+    data = request.encode()
+    return b"%04x" % len(data) + data
+
+
+async def read_string(reader: asyncio.StreamReader):
+    length = int(await reader.readexactly(4), 16)
+    return await reader.readexactly(length)
+
+
+@dataclasses.dataclass
+class ServerError(symmetrical_doodle.adb.Error):
+    request: str
+    message: bytes
+
+
+async def read_status(reader: asyncio.StreamReader, request: str):
+    status = await reader.readexactly(4)
+    if status == FAIL:
+        raise ServerError(request, await read_string(reader))
+    assert status == OKAY
+
+
+async def sync_stat(
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter], path: str
+):
+    """Returns the mode, size and mtime of a device file, all 0 if it does not
+    exist."""
+    reader, writer = connection
+    data = path.encode()
+    writer.write(SYNC_HEADER.pack(b"STAT", len(data)) + data)
+    id = await reader.readexactly(4)
+    assert id == b"STAT"
+    return SYNC_STAT.unpack(await reader.readexactly(SYNC_STAT.size))
+
+
+async def sync_send(
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter],
+    local: pathlib.Path,
+    remote: str,
+    mode: int,
+    mtime: int,
+):
+    reader, writer = connection
+    data = f"{remote},{mode}".encode()
+    writer.write(SYNC_HEADER.pack(b"SEND", len(data)) + data)
+    with local.open("rb") as f:
+        while chunk := f.read(SYNC_DATA_MAX):
+            writer.write(SYNC_HEADER.pack(b"DATA", len(chunk)) + chunk)
+            await writer.drain()
+    # the device file gets the mtime, so that it can be compared next time
+    writer.write(SYNC_HEADER.pack(b"DONE", mtime))
+    id, length = SYNC_HEADER.unpack(await reader.readexactly(SYNC_HEADER.size))
+    if id == FAIL:
+        raise ServerError(f"SEND {remote}", await reader.readexactly(length))
+    assert id == OKAY
+
+
+async def sync_quit(connection: tuple[asyncio.StreamReader, asyncio.StreamWriter]):
+    _, writer = connection
+    writer.write(SYNC_HEADER.pack(b"QUIT", 0))
+    await writer.drain()
+
+
+@dataclasses.dataclass
+class FinishedProcess:
+    """Stands for a process which has already exited successfully."""
+
+    returncode: int = 0
+    pid: int = 0
+    stdout: None = None
+
+    async def wait(self):
+        return self.returncode
+
+    async def communicate(self, input: None = None):
+        return None, None
+
+    def kill(self):
+        pass
+
+
+@dataclasses.dataclass
+class ShellProcess:
+    """The part of asyncio.subprocess.Process used for shell commands run
+    through the adb server with the shell protocol v2.
+
+    Each output is either written to sys.stdout or sys.stderr, like an
+    inherited one, or fed to its reader. The return code is the exit status
+    sent by the device, or 1 if the connection is closed without one, like the
+    adb executable does. There is no local process, so pid is 0.
+    """
+
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter]
+    pipe_stdout: bool = False
+    pipe_stderr: bool = False
+
+    pid: int = dataclasses.field(default=0, init=False)
+    stdout: Optional[asyncio.StreamReader] = dataclasses.field(default=None, init=False)
+    stderr: Optional[asyncio.StreamReader] = dataclasses.field(default=None, init=False)
+    returncode: Optional[int] = dataclasses.field(default=None, init=False)
+    done: asyncio.Event = dataclasses.field(default_factory=asyncio.Event, init=False)
+    task: Optional[asyncio.Task[None]] = dataclasses.field(default=None, init=False)
+
+    def __post_init__(self):
+        if self.pipe_stdout:
+            self.stdout = asyncio.StreamReader()
+        if self.pipe_stderr:
+            self.stderr = asyncio.StreamReader()
+        self.task = asyncio.create_task(self.forward_output())
+
+    async def forward_output(self):
+        reader, _ = self.connection
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(SHELL_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    # closed without an exit packet
+                    break
+                id, length = SHELL_HEADER.unpack(header)
+                data = await reader.readexactly(length)
+                if id == SHELL_EXIT:
+                    self.returncode = data[0]
+                    break
+                elif id == SHELL_STDOUT:
+                    self.feed(self.stdout, sys.stdout, data)
+                elif id == SHELL_STDERR:
+                    self.feed(self.stderr, sys.stderr, data)
+        finally:
+            if self.stdout is not None:
+                self.stdout.feed_eof()
+            if self.stderr is not None:
+                self.stderr.feed_eof()
+            if self.returncode is None:
+                self.returncode = 1
+            self.done.set()
+
+    @staticmethod
+    def feed(pipe: Optional[asyncio.StreamReader], file: TextIO, data: bytes):
+        if pipe is not None:
+            pipe.feed_data(data)
+        else:
+            file.buffer.write(data)
+            file.buffer.flush()
+
+    async def wait(self):
+        await self.done.wait()
+        assert self.returncode is not None
+        return self.returncode
+
+    async def communicate(self, input: None = None):
+        assert input is None
+        stdout = None if self.stdout is None else await self.stdout.read()
+        stderr = None if self.stderr is None else await self.stderr.read()
+        await self.wait()
+        return stdout, stderr
+
+    def kill(self):
+        self.returncode = -9
+        _, writer = self.connection
+        writer.close()
+
+
+@dataclasses.dataclass
+class SocketADB(symmetrical_doodle.adb.ADB):
+    """An ADB client talking to the adb server over its smart socket protocol,
+    instead of running the adb executable for each command.
+
+    Every request is sent on a new connection, as the adb server closes it
+    afterwards. If the adb server cannot be reached, the adb executable is used
+    instead.
+    """
+
+    host: str = "127.0.0.1"
+    port: int = dataclasses.field(default_factory=get_default_port)
+
+    def get_host_prefix(self):
+        """Returns the prefix of the host services of the selected device."""
+        options = self.global_options
+        if "-s" in options:
+            return f"host-serial:{self.serial}:"
+        elif "-t" in options:
+            return f"host-transport-id:{self.transport_id}:"
+        elif "-d" in options:
+            return "host-usb:"
+        elif "-e" in options:
+            return "host-local:"
+        else:
+            return "host:"
+
+    def get_transport_request(self):
+        """Returns the request switching a connection to the selected device."""
+        options = self.global_options
+        if "-s" in options:
+            return f"host:transport:{self.serial}"
+        elif "-t" in options:
+            return f"host:transport-id:{self.transport_id}"
+        elif "-d" in options:
+            return "host:transport-usb"
+        elif "-e" in options:
+            return "host:transport-local"
+        else:
+            return "host:transport-any"
+
+    def to_called_process_error(self, command: list[str], e: ServerError):
+        # the error the adb executable would have raised
+        return symmetrical_doodle.adb.CalledProcessError(
+            symmetrical_doodle.adb.CompletedProcess(
+                1, self.program, self.get_args(command), b"", e.message, 0
+            )
+        )
+
+    async def open(self, request: str, transport: bool = False):
+        """Opens a connection and sends a request, after switching to the
+        selected device if transport."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            if transport:
+                transport_request = self.get_transport_request()
+                writer.write(encode_request(transport_request))
+                await read_status(reader, transport_request)
+            writer.write(encode_request(request))
+            await read_status(reader, request)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def query(self, request: str, transport: bool = False, okays: int = 1):
+        """Sends a one-shot request and returns the rest of the reply."""
+        connection = await self.open(request, transport)
+        reader, _ = connection
+        try:
+            for _ in range(okays - 1):
+                await read_status(reader, request)
+            return await reader.read()
+        finally:
+            await symmetrical_doodle.utils.conection.close_connection(connection)
+
+    async def is_server_running(self):
+        try:
+            await self.query("host:version")
+        except OSError:
+            return False
+        return True
+
+    async def start_server(self) -> symmetrical_doodle.adb.Process:
+        if await self.is_server_running():
+            return FinishedProcess()
+        return await super().start_server()
+
+    async def list_connected_devices(self):
+        try:
+            reply = await self.query("host:devices-l")
+        except OSError:
+            return await super().list_connected_devices()
+        result = reply[4:]
+        assert len(result) == int(reply[:4], 16)
+        return [
+            symmetrical_doodle.adb.parse_device(line) for line in result.splitlines()
+        ]
+
+    async def connect(self, host: str, port: Optional[int] = None):
+        address = host if port is None else f"{host}:{port}"
+        try:
+            reply = await self.query(f"host:connect:{address}")
+        except OSError:
+            return await super().connect(host, port)
+        return reply[4:]
+
+    async def disconnect(self, host: Optional[str] = None, port: Optional[int] = None):
+        if host is None:
+            assert port is None
+            address = ""
+        else:
+            address = host if port is None else f"{host}:{port}"
+        command = ["disconnect", address]
+        try:
+            reply = await self.query(f"host:disconnect:{address}")
+        except OSError:
+            return await super().disconnect(host, port)
+        except ServerError as e:
+            raise self.to_called_process_error(command, e)
+        return reply[4:]
+
+    async def forward(self, local: str, remote: str):
+        command = ["forward", local, remote]
+        try:
+            # the first OKAY is for the connection, the second one for the
+            # status
+            reply = await self.query(
+                f"{self.get_host_prefix()}forward:{local};{remote}", okays=2
+            )
+        except OSError:
+            return await super().forward(local, remote)
+        except ServerError as e:
+            raise self.to_called_process_error(command, e)
+        if reply:
+            # the resolved port, for tcp:0
+            return int(reply[4:])
+        else:
+            return None
+
+    async def forward_remove(self, local: str):
+        command = ["forward", "--remove", local]
+        try:
+            await self.query(f"{self.get_host_prefix()}killforward:{local}", okays=2)
+        except OSError:
+            return await super().forward_remove(local)
+        except ServerError as e:
+            raise self.to_called_process_error(command, e)
+        return symmetrical_doodle.adb.CompletedProcess(
+            0, self.program, self.get_args(command), b"", b"", 0
+        )
+
+    async def reverse(self, remote: str, local: str):
+        command = ["reverse", remote, local]
+        try:
+            # the first OKAY is for the connection, the second one for the
+            # status
+            reply = await self.query(
+                f"reverse:forward:{remote};{local}", transport=True, okays=2
+            )
+        except OSError:
+            return await super().reverse(remote, local)
+        except ServerError as e:
+            raise self.to_called_process_error(command, e)
+        if reply:
+            return int(reply[4:])
+        else:
+            return None
+
+    async def reverse_remove(self, remote: str):
+        command = ["reverse", "--remove", remote]
+        try:
+            await self.query(f"reverse:killforward:{remote}", transport=True, okays=2)
+        except OSError:
+            return await super().reverse_remove(remote)
+        except ServerError as e:
+            raise self.to_called_process_error(command, e)
+        return symmetrical_doodle.adb.CompletedProcess(
+            0, self.program, self.get_args(command), b"", b"", 0
+        )
+
+    async def get_serialno(self):
+        try:
+            reply = await self.query(f"{self.get_host_prefix()}get-serialno")
+        except OSError:
+            return await super().get_serialno()
+        except ServerError as e:
+            raise self.to_called_process_error(["get-serialno"], e)
+        result = reply[4:]
+        if result == b"unknown":
+            return b""
+        else:
+            return result
+
+    async def push(
+        self, locals: list[str], remote: str
+    ) -> symmetrical_doodle.adb.Process:
+        """Pushes a file with the sync protocol.
+
+        The transfer is skipped if the device file has the same size and mtime
+        as the local file, as the previous push set its mtime.
+        """
+        if len(locals) != 1:
+            return await super().push(locals, remote)
+        local = pathlib.Path(locals[0])
+        local_stat = local.stat()
+        mode = stat.S_IMODE(local_stat.st_mode)
+        mtime = int(local_stat.st_mtime)
+
+        try:
+            connection = await self.open("sync:", transport=True)
+        except OSError:
+            return await super().push(locals, remote)
+        except ServerError as e:
+            raise self.to_called_process_error(["push", *locals, remote], e)
+        try:
+            remote_mode, size, remote_mtime = await sync_stat(connection, remote)
+            if stat.S_ISDIR(remote_mode):
+                # the name of the device file is not known
+                return await super().push(locals, remote)
+            if (
+                stat.S_ISREG(remote_mode)
+                and size == local_stat.st_size
+                and remote_mtime == mtime
+            ):
+                logger.debug("%s is up to date", remote)
+            else:
+                await sync_send(connection, local, remote, mode, mtime)
+            await sync_quit(connection)
+        except ServerError as e:
+            raise self.to_called_process_error(["push", *locals, remote], e)
+        finally:
+            await symmetrical_doodle.utils.conection.close_connection(connection)
+        return FinishedProcess()
+
+    async def shell(
+        self, args: list[str], stdout=None, stderr=None
+    ) -> symmetrical_doodle.adb.Process:
+        """Runs a shell command on the device.
+
+        If stdout or stderr is asyncio.subprocess.PIPE, the output is available
+        from the reader of the process, otherwise it is written to sys.stdout or
+        sys.stderr.
+        """
+        try:
+            connection = await self.open(
+                f"shell,v2,raw:{' '.join(args)}", transport=True
+            )
+        except (OSError, ServerError):
+            # no adb server, or a device without the shell protocol v2 whose
+            # exit status only the adb executable can tell; the executable
+            # also reports the other errors
+            return await super().run_command(
+                ["shell", *args], stdout=stdout, stderr=stderr
+            )
+        return ShellProcess(
+            connection,
+            stdout == asyncio.subprocess.PIPE,
+            stderr == asyncio.subprocess.PIPE,
+        )
+
+    def run_command(
+        self,
+        command: list[str],
+        stdin=None,
+        stdout=None,
+        stderr=None,
+        limit=None,
+        **kwds,
+    ) -> Awaitable[symmetrical_doodle.adb.Process]:
+        if (
+            command
+            and command[0] == "shell"
+            and stdin is None
+            and stdout in (None, asyncio.subprocess.PIPE)
+            and stderr in (None, asyncio.subprocess.PIPE)
+            and not kwds
+        ):
+            return self.shell(command[1:], stdout, stderr)
+        return super().run_command(
+            command, stdin=stdin, stdout=stdout, stderr=stderr, limit=limit, **kwds
+        )
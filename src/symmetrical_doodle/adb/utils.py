@@ -68,6 +68,7 @@ async def get_device_ip(adb: symmetrical_doodle.adb.ADB):
     )
     stdout, _ = await process.communicate()
     assert not process.returncode
+    assert stdout is not None
     return parse_device_ip_from_output(stdout)
 
 
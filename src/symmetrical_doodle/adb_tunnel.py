@@ -30,7 +30,32 @@ class Tunnel:
     device_socket_name: str
 
     @contextlib.asynccontextmanager
-    async def open(self, port: Optional[int] = None, force_forward: bool = False):
+    async def open(
+        self,
+        port: Optional[int] = None,
+        force_forward: bool = False,
+        keep: bool = False,
+    ):
+        """Enables the tunnel while the connections are being established.
+
+        If keep, the tunnel is left enabled unless something fails, and the
+        next open() reuses it instead of recreating it; close() must then be
+        called explicitly.
+        """
+        if self.forward is None:
+            await self.enable(port, force_forward)
+        else:
+            # reused, the connections of a previous server are stale
+            await self.close_connections()
+        try:
+            yield
+        except BaseException:
+            await self.close()
+            raise
+        if not keep:
+            await self.close()
+
+    async def enable(self, port: Optional[int] = None, force_forward: bool = False):
         if force_forward:
             await self.enable_forward(port)
         else:
@@ -39,10 +64,6 @@ class Tunnel:
             except symmetrical_doodle.adb.CalledProcessError:
                 logger.warning("'adb reverse' failed, fallback to 'adb forward'")
                 await self.enable_forward(port)
-        try:
-            yield
-        finally:
-            await self.close()
 
     async def enable_forward(self, port: Optional[int] = None):
         assert self.forward is None
@@ -97,6 +118,9 @@ class Tunnel:
             assert server is not None
             server.close()
             await self.close_connections()
+            self.server = None
+        self.forward = None
+        self.local_port = None
 
     async def close_connections(self):
         connections = self.connections
@@ -0,0 +1,203 @@
+import asyncio
+from typing import Optional
+
+DEFAULT_CAPACITY = 1 << 16
+
+
+class BufferedReader(asyncio.BufferedProtocol):
+    """Receives data without allocating a new object for every read.
+
+    Small reads are served from a preallocated arena. Large reads are received
+    directly into the caller's buffer by ``readinto``.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        previous: Optional[asyncio.BaseProtocol] = None,
+    ):
+        self.arena = bytearray(capacity)
+        self.view = memoryview(self.arena)
+        # arena[start:end] holds the data received but not consumed yet
+        self.start = 0
+        self.end = 0
+
+        # the destination of a pending readinto(), only set when the arena is
+        # empty
+        self.target: Optional[memoryview] = None
+        self.filled = 0
+
+        self.waiter: Optional[asyncio.Future[None]] = None
+        self.transport: Optional[asyncio.Transport] = None
+        self.paused = False
+        self.eof = False
+        self.exception: Optional[BaseException] = None
+
+        # the protocol replaced by this reader, it is still notified when the
+        # connection is lost so that its writer can be closed
+        self.previous = previous
+
+    def connection_made(self, transport: asyncio.BaseTransport):
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.eof = True
+        if exc is not None:
+            self.exception = exc
+        self.wake_up()
+        if self.previous is not None:
+            self.previous.connection_lost(exc)
+
+    def pause_writing(self):
+        if self.previous is not None:
+            self.previous.pause_writing()
+
+    def resume_writing(self):
+        if self.previous is not None:
+            self.previous.resume_writing()
+
+    def eof_received(self):
+        self.eof = True
+        self.wake_up()
+
+    def get_buffer(self, sizehint: int):
+        if self.target is not None:
+            return self.target[self.filled :]
+        return self.view[self.end :]
+
+    def buffer_updated(self, nbytes: int):
+        if self.target is not None:
+            self.filled += nbytes
+            if self.filled == len(self.target):
+                # the following data goes to the arena again
+                self.target = None
+                self.wake_up()
+            return
+
+        self.end += nbytes
+        if self.end == len(self.arena):
+            self.pause_reading()
+        self.wake_up()
+
+    def feed(self, data: bytes):
+        """Appends data received before this reader took over the transport."""
+        assert self.target is None
+        self.compact()
+        end = self.end + len(data)
+        assert end <= len(self.arena)
+        self.arena[self.end : end] = data
+        self.end = end
+        if self.end == len(self.arena):
+            self.pause_reading()
+
+    def wake_up(self):
+        waiter = self.waiter
+        self.waiter = None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def wait(self):
+        if self.exception is not None:
+            raise self.exception
+        assert self.waiter is None
+        self.waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self.waiter
+        finally:
+            self.waiter = None
+
+    def pause_reading(self):
+        if not self.paused and self.transport is not None:
+            self.paused = True
+            self.transport.pause_reading()
+
+    def resume_reading(self):
+        if self.paused and self.transport is not None:
+            self.paused = False
+            self.transport.resume_reading()
+
+    def compact(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.start:
+            size = self.end - self.start
+            self.arena[:size] = self.view[self.start : self.end]
+            self.start = 0
+            self.end = size
+        if self.end < len(self.arena):
+            self.resume_reading()
+
+    async def readexactly(self, n: int):
+        """Reads exactly n bytes into the arena.
+
+        The returned view is only valid until the next read.
+        """
+        assert 0 < n <= len(self.arena)
+        if self.start + n > len(self.arena):
+            self.compact()
+        while self.end - self.start < n:
+            if self.eof:
+                raise asyncio.IncompleteReadError(
+                    bytes(self.view[self.start : self.end]), n
+                )
+            self.resume_reading()
+            await self.wait()
+        start = self.start
+        self.start += n
+        if self.start == self.end:
+            self.start = self.end = 0
+            self.resume_reading()
+        return self.view[start : start + n]
+
+    async def readinto(self, buf: memoryview):
+        """Fills buf, receiving directly into it once the arena is drained."""
+        size = min(len(buf), self.end - self.start)
+        buf[:size] = self.view[self.start : self.start + size]
+        self.start += size
+        if self.start != self.end:
+            return
+        self.start = self.end = 0
+        if size == len(buf):
+            self.resume_reading()
+            return
+
+        self.target = buf
+        self.filled = size
+        try:
+            while self.target is not None:
+                if self.eof:
+                    raise asyncio.IncompleteReadError(
+                        bytes(buf[: self.filled]), len(buf)
+                    )
+                self.resume_reading()
+                await self.wait()
+        finally:
+            self.target = None
+
+
+async def take_over(
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter],
+    capacity: int = DEFAULT_CAPACITY,
+):
+    """Replaces the stream reader of a connection by a BufferedReader.
+
+    The stream reader must not be used afterwards.
+    """
+    reader, writer = connection
+    transport = writer.transport
+    assert isinstance(transport, asyncio.Transport)
+
+    # stop receiving and collect what the stream reader has already buffered
+    transport.pause_reading()
+    reader.feed_eof()
+    pending = await reader.read()
+
+    protocol = BufferedReader(max(capacity, len(pending)), transport.get_protocol())
+    protocol.connection_made(transport)
+    protocol.feed(pending)
+    protocol.paused = True
+
+    transport.set_protocol(protocol)
+    protocol.compact()
+    return protocol
@@ -344,6 +344,11 @@ def get_parser():
         action="store_true",
         help='Enable "show touches" on start, restore the initial value on exit. It only shows physical touches (not clicks from scrcpy).',
     )
+    parser.add_argument(
+        "--startup-report",
+        help='Write the duration of each startup phase, up to the first frame, to a JSON file ("-" for stdout). The phases are also logged at the debug verbosity.',
+        metavar="file.json",
+    )
     parser.add_argument(
         "--tcpip",
         help="Configure and reconnect the device over TCP/IP.",
@@ -622,6 +627,7 @@ def parse_args(args=None):
         start_fps_counter=args.print_fps,
         otg=otg,
         v4l2_device=v4l2_device,
+        startup_report=args.startup_report,
         **kwargs,
     )
     return options
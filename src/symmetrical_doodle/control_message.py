@@ -1,12 +1,16 @@
 import dataclasses
 import enum
+import struct
+from typing import TYPE_CHECKING, Sequence
 
 import symmetrical_doodle.android.input
-import symmetrical_doodle.android.keycodes
 import symmetrical_doodle.coords
-import symmetrical_doodle.utils.buffer
 import symmetrical_doodle.utils.str
 
+if TYPE_CHECKING:
+    # a large enum, only needed by the callers creating key events
+    import symmetrical_doodle.android.keycodes
+
 CONTROL_MSG_MAX_SIZE = 1 << 18
 
 CONTROL_MSG_INJECT_TEXT_MAX_LENGTH = 300
@@ -43,17 +47,8 @@ class CopyKey(enum.Enum):
     CUT = enum.auto()
 
 
-def write_position(buf: bytearray, position: symmetrical_doodle.coords.Position):
-    symmetrical_doodle.utils.buffer.write32be(buf, position.point.x)
-    symmetrical_doodle.utils.buffer.write32be(buf, position.point.y)
-    symmetrical_doodle.utils.buffer.write16be(buf, position.screen_size.width)
-    symmetrical_doodle.utils.buffer.write16be(buf, position.screen_size.height)
-
-
-def write_string(buf: bytearray, utf8: bytes, max_len: int):
-    length = symmetrical_doodle.utils.str.str_utf8_truncation_index(utf8, max_len)
-    symmetrical_doodle.utils.buffer.write32be(buf, length)
-    buf.extend(utf8[:length])
+def get_string_length(utf8: bytes, max_len: int):
+    return symmetrical_doodle.utils.str.str_utf8_truncation_index(utf8, max_len)
 
 
 def to_fixed_point_16(f: float):
@@ -66,30 +61,52 @@ def to_fixed_point_16(f: float):
 
 @dataclasses.dataclass
 class ControlMessage:
+    """A message sent to the device.
+
+    The fixed-size messages are packed with the precompiled LAYOUT of their
+    class (big-endian, the type first).
+    """
+
     type: ControlMessageType = dataclasses.field(init=False)
 
-    def get_buf(self):
-        return bytearray([self.type.value])
+    LAYOUT = struct.Struct(">B")
+
+    def get_size(self):
+        return self.LAYOUT.size
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        """Writes the message into buf at offset, and returns the offset after
+        it."""
+        self.LAYOUT.pack_into(buf, offset, self.type.value)
+        return offset + self.LAYOUT.size
 
     def serialize(self):
-        return self.get_buf()
+        buf = bytearray(self.get_size())
+        self.serialize_into(buf, 0)
+        return buf
 
 
 @dataclasses.dataclass
 class InjectKeycode(ControlMessage):
     type = ControlMessageType.INJECT_KEYCODE
     action: symmetrical_doodle.android.input.KeyEventAction
-    keycode: symmetrical_doodle.android.keycodes.Keycode
+    keycode: "symmetrical_doodle.android.keycodes.Keycode"
     repeat: int
     meta_state: int
 
-    def serialize(self):
-        buf = self.get_buf()
-        buf.append(self.action.value)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.keycode.value)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.repeat)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.meta_state)
-        return buf
+    LAYOUT = struct.Struct(">BBIII")
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        self.LAYOUT.pack_into(
+            buf,
+            offset,
+            self.type.value,
+            self.action.value,
+            self.keycode.value,
+            self.repeat,
+            self.meta_state,
+        )
+        return offset + self.LAYOUT.size
 
 
 @dataclasses.dataclass
@@ -97,10 +114,19 @@ class InjectText(ControlMessage):
     type = ControlMessageType.INJECT_TEXT
     text: bytes
 
-    def serialize(self):
-        buf = self.get_buf()
-        write_string(buf, self.text, CONTROL_MSG_INJECT_TEXT_MAX_LENGTH)
-        return buf
+    # followed by the text
+    LAYOUT = struct.Struct(">BI")
+
+    def get_size(self):
+        length = get_string_length(self.text, CONTROL_MSG_INJECT_TEXT_MAX_LENGTH)
+        return self.LAYOUT.size + length
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        length = get_string_length(self.text, CONTROL_MSG_INJECT_TEXT_MAX_LENGTH)
+        self.LAYOUT.pack_into(buf, offset, self.type.value, length)
+        offset += self.LAYOUT.size
+        buf[offset : offset + length] = self.text[:length]
+        return offset + length
 
 
 @dataclasses.dataclass
@@ -112,15 +138,25 @@ class InjectTouchEvent(ControlMessage):
     position: symmetrical_doodle.coords.Position
     pressure: float
 
-    def serialize(self):
-        buf = self.get_buf()
-        buf.append(self.action.value)
-        symmetrical_doodle.utils.buffer.write64be(buf, self.pointer_id)
-        write_position(buf, self.position)
-        pressure = to_fixed_point_16(self.pressure)
-        symmetrical_doodle.utils.buffer.write16be(buf, pressure)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.buttons)
-        return buf
+    # type, action, pointer id, x, y, width, height, pressure, buttons
+    LAYOUT = struct.Struct(">BBQIIHHHI")
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        position = self.position
+        self.LAYOUT.pack_into(
+            buf,
+            offset,
+            self.type.value,
+            self.action.value,
+            self.pointer_id,
+            position.point.x,
+            position.point.y,
+            position.screen_size.width,
+            position.screen_size.height,
+            to_fixed_point_16(self.pressure),
+            self.buttons,
+        )
+        return offset + self.LAYOUT.size
 
 
 @dataclasses.dataclass
@@ -131,13 +167,24 @@ class InjectScrollEvent(ControlMessage):
     vscroll: int
     buttons: int
 
-    def serialize(self):
-        buf = self.get_buf()
-        write_position(buf, self.position)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.hscroll)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.vscroll)
-        symmetrical_doodle.utils.buffer.write32be(buf, self.buttons)
-        return buf
+    # type, x, y, width, height, hscroll, vscroll, buttons
+    LAYOUT = struct.Struct(">BIIHHIII")
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        position = self.position
+        self.LAYOUT.pack_into(
+            buf,
+            offset,
+            self.type.value,
+            position.point.x,
+            position.point.y,
+            position.screen_size.width,
+            position.screen_size.height,
+            self.hscroll,
+            self.vscroll,
+            self.buttons,
+        )
+        return offset + self.LAYOUT.size
 
 
 @dataclasses.dataclass
@@ -145,10 +192,11 @@ class BackOrScreenOn(ControlMessage):
     type = ControlMessageType.BACK_OR_SCREEN_ON
     action: symmetrical_doodle.android.input.KeyEventAction
 
-    def serialize(self):
-        buf = self.get_buf()
-        buf.append(self.action.value)
-        return buf
+    LAYOUT = struct.Struct(">BB")
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        self.LAYOUT.pack_into(buf, offset, self.type.value, self.action.value)
+        return offset + self.LAYOUT.size
 
 
 @dataclasses.dataclass
@@ -156,10 +204,11 @@ class GetClipboard(ControlMessage):
     type = ControlMessageType.GET_CLIPBOARD
     copy_key: CopyKey
 
-    def serialize(self):
-        buf = self.get_buf()
-        buf.append(self.copy_key.value)
-        return buf
+    LAYOUT = struct.Struct(">BB")
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        self.LAYOUT.pack_into(buf, offset, self.type.value, self.copy_key.value)
+        return offset + self.LAYOUT.size
 
 
 @dataclasses.dataclass
@@ -169,12 +218,21 @@ class SetClipboard(ControlMessage):
     text: bytes
     paste: bool
 
-    def serialize(self):
-        buf = self.get_buf()
-        symmetrical_doodle.utils.buffer.write64be(buf, self.sequence)
-        buf.append(self.paste)
-        write_string(buf, self.text, CONTROL_MSG_CLIPBOARD_TEXT_MAX_LENGTH)
-        return buf
+    # type, sequence, paste, text length, followed by the text
+    LAYOUT = struct.Struct(">BQBI")
+
+    def get_size(self):
+        length = get_string_length(self.text, CONTROL_MSG_CLIPBOARD_TEXT_MAX_LENGTH)
+        return self.LAYOUT.size + length
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        length = get_string_length(self.text, CONTROL_MSG_CLIPBOARD_TEXT_MAX_LENGTH)
+        self.LAYOUT.pack_into(
+            buf, offset, self.type.value, self.sequence, self.paste, length
+        )
+        offset += self.LAYOUT.size
+        buf[offset : offset + length] = self.text[:length]
+        return offset + length
 
 
 @dataclasses.dataclass
@@ -182,10 +240,11 @@ class SetScreenPowerMode(ControlMessage):
     type = ControlMessageType.SET_SCREEN_POWER_MODE
     mode: ScreenPowerMode
 
-    def serialize(self):
-        buf = self.get_buf()
-        buf.append(self.mode.value)
-        return buf
+    LAYOUT = struct.Struct(">BB")
+
+    def serialize_into(self, buf: bytearray, offset: int):
+        self.LAYOUT.pack_into(buf, offset, self.type.value, self.mode.value)
+        return offset + self.LAYOUT.size
 
 
 @dataclasses.dataclass
@@ -206,3 +265,25 @@ class CollapsePanels(ControlMessage):
 @dataclasses.dataclass
 class RotateDevice(ControlMessage):
     type = ControlMessageType.ROTATE_DEVICE
+
+
+@dataclasses.dataclass
+class Serializer:
+    """Serializes batches of messages into a reusable buffer."""
+
+    buf: bytearray = dataclasses.field(default_factory=bytearray, init=False)
+
+    def serialize(self, messages: Sequence[ControlMessage]):
+        """Returns the messages serialized one after another.
+
+        The result is a view of the buffer, only valid until the next call.
+        """
+        size = sum(message.get_size() for message in messages)
+        if len(self.buf) < size:
+            # replaced instead of resized, a previous view may still exist
+            self.buf = bytearray(max(size, 2 * len(self.buf)))
+        buf = self.buf
+        offset = 0
+        for message in messages:
+            offset = message.serialize_into(buf, offset)
+        return memoryview(buf)[:size]
@@ -0,0 +1,232 @@
+import asyncio
+import collections
+import dataclasses
+import enum
+from typing import Sequence
+
+import symmetrical_doodle.android.input
+import symmetrical_doodle.control_message
+import symmetrical_doodle.tasks
+
+ControlTask = symmetrical_doodle.tasks.Task[
+    symmetrical_doodle.control_message.ControlMessage
+]
+
+MOVE_ACTIONS = (
+    symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_MOVE,
+    symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_HOVER_MOVE,
+)
+
+SYSTEM_MESSAGES = (
+    symmetrical_doodle.control_message.BackOrScreenOn,
+    symmetrical_doodle.control_message.SetScreenPowerMode,
+    symmetrical_doodle.control_message.ExpandNotificationPanel,
+    symmetrical_doodle.control_message.ExpandSettingsPanel,
+    symmetrical_doodle.control_message.CollapsePanels,
+    symmetrical_doodle.control_message.RotateDevice,
+    symmetrical_doodle.control_message.GetClipboard,
+    symmetrical_doodle.control_message.SetClipboard,
+)
+
+
+class Lane(enum.IntEnum):
+    """The lanes of a control queue, by decreasing priority."""
+
+    SYSTEM = 0
+    KEY = enum.auto()
+    MOTION = enum.auto()
+
+
+class OverflowPolicy(enum.Enum):
+    BLOCK = 0
+    """wait for the controller, stalling the producer"""
+    DROP_OLDEST = enum.auto()
+    """drop the oldest queued droppable message"""
+    DROP_NEWEST = enum.auto()
+    """drop the new message if it is droppable"""
+
+
+def is_move(message: symmetrical_doodle.control_message.ControlMessage):
+    return (
+        isinstance(message, symmetrical_doodle.control_message.InjectTouchEvent)
+        and message.action in MOVE_ACTIONS
+    )
+
+
+def is_droppable(message: symmetrical_doodle.control_message.ControlMessage):
+    # a lost move or scroll is superseded by the next one, but a lost down, up
+    # or key event would leave the device in a wrong state
+    return is_move(message) or isinstance(
+        message, symmetrical_doodle.control_message.InjectScrollEvent
+    )
+
+
+def get_lane(message: symmetrical_doodle.control_message.ControlMessage):
+    if isinstance(message, SYSTEM_MESSAGES):
+        return Lane.SYSTEM
+    if isinstance(
+        message,
+        (
+            symmetrical_doodle.control_message.InjectKeycode,
+            symmetrical_doodle.control_message.InjectText,
+        ),
+    ):
+        return Lane.KEY
+    # the touch downs and ups stay with the moves, to keep their order
+    return Lane.MOTION
+
+
+@dataclasses.dataclass
+class LaneQueue:
+    """A lane with a bound and a policy applied when it is full.
+
+    A maxsize of 0 means unbounded. The non-droppable messages are never
+    dropped, they are queued beyond the bound unless the policy is BLOCK.
+    A dropped message is completed.
+    """
+
+    maxsize: int = 0
+    policy: OverflowPolicy = OverflowPolicy.BLOCK
+
+    tasks: collections.deque[ControlTask] = dataclasses.field(
+        default_factory=collections.deque, init=False
+    )
+    dropped: int = dataclasses.field(default=0, init=False)
+    """the number of messages dropped so far"""
+    not_full: asyncio.Event = dataclasses.field(
+        default_factory=asyncio.Event, init=False
+    )
+
+    def __post_init__(self):
+        self.not_full.set()
+
+    def full(self):
+        return 0 < self.maxsize <= len(self.tasks)
+
+    def has_room(self, count: int):
+        # an empty lane takes any number of tasks, or they could never be put
+        return (
+            not self.maxsize
+            or not self.tasks
+            or len(self.tasks) + count <= self.maxsize
+        )
+
+    def updated(self):
+        if self.full():
+            self.not_full.clear()
+        else:
+            self.not_full.set()
+
+    def drop(self, task: ControlTask):
+        self.dropped += 1
+        task.complete()
+
+    def drop_oldest(self):
+        for i, task in enumerate(self.tasks):
+            if is_droppable(task.todo):
+                del self.tasks[i]
+                self.drop(task)
+                return
+
+    def put_nowait(self, task: ControlTask):
+        if self.full():
+            if self.policy is OverflowPolicy.BLOCK:
+                raise asyncio.QueueFull
+            elif self.policy is OverflowPolicy.DROP_OLDEST:
+                self.drop_oldest()
+            elif self.policy is OverflowPolicy.DROP_NEWEST:
+                if is_droppable(task.todo):
+                    self.drop(task)
+                    return
+        self.append(task)
+
+    def append(self, task: ControlTask):
+        self.tasks.append(task)
+        self.updated()
+
+    def get_nowait(self):
+        task = self.tasks.popleft()
+        self.updated()
+        return task
+
+
+def create_lanes():
+    return {
+        Lane.SYSTEM: LaneQueue(64, OverflowPolicy.BLOCK),
+        Lane.KEY: LaneQueue(256, OverflowPolicy.BLOCK),
+        Lane.MOTION: LaneQueue(256, OverflowPolicy.DROP_OLDEST),
+    }
+
+
+@dataclasses.dataclass
+class ControlQueue:
+    """A queue of control messages with a lane per kind of message.
+
+    The messages of a higher priority lane overtake the queued messages of
+    the lower priority lanes, but the order within a lane is kept.
+    """
+
+    lanes: dict[Lane, LaneQueue] = dataclasses.field(default_factory=create_lanes)
+
+    not_empty: asyncio.Event = dataclasses.field(
+        default_factory=asyncio.Event, init=False
+    )
+
+    def qsize(self):
+        return sum(len(lane.tasks) for lane in self.lanes.values())
+
+    def empty(self):
+        return not any(lane.tasks for lane in self.lanes.values())
+
+    def put_nowait(self, task: ControlTask):
+        self.lanes[get_lane(task.todo)].put_nowait(task)
+        self.not_empty.set()
+
+    async def put(self, task: ControlTask):
+        lane = self.lanes[get_lane(task.todo)]
+        if lane.policy is OverflowPolicy.BLOCK:
+            while lane.full():
+                await lane.not_full.wait()
+        self.put_nowait(task)
+
+    async def put_many(self, tasks: Sequence[ControlTask]):
+        """Queues tasks as a unit, no other task is queued between them.
+
+        The blocking lanes are waited for until they have room for all their
+        tasks.
+        """
+        counts = collections.Counter(get_lane(task.todo) for task in tasks)
+        while True:
+            waiting = [
+                self.lanes[lane]
+                for lane, count in counts.items()
+                if self.lanes[lane].policy is OverflowPolicy.BLOCK
+                and not self.lanes[lane].has_room(count)
+            ]
+            if not waiting:
+                break
+            # set again by the next get, whether the lane is full or not
+            waiting[0].not_full.clear()
+            await waiting[0].not_full.wait()
+        for task in tasks:
+            lane_queue = self.lanes[get_lane(task.todo)]
+            if lane_queue.policy is OverflowPolicy.BLOCK:
+                # the room was checked for all the tasks
+                lane_queue.append(task)
+                self.not_empty.set()
+            else:
+                self.put_nowait(task)
+
+    def get_nowait(self):
+        for lane in sorted(self.lanes):
+            lane_queue = self.lanes[lane]
+            if lane_queue.tasks:
+                return lane_queue.get_nowait()
+        self.not_empty.clear()
+        raise asyncio.QueueEmpty
+
+    async def get(self):
+        while self.empty():
+            self.not_empty.clear()
+            await self.not_empty.wait()
+        return self.get_nowait()
@@ -1,30 +1,120 @@
 import asyncio
+import collections
 import dataclasses
+from typing import Optional, Sequence
 
 import symmetrical_doodle.control_message
+import symmetrical_doodle.control_queues
 import symmetrical_doodle.tasks
 
 
+def get_pointer_id(message: symmetrical_doodle.control_message.ControlMessage):
+    """Returns the pointer id of a touch event, or None."""
+    if isinstance(message, symmetrical_doodle.control_message.InjectTouchEvent):
+        return message.pointer_id
+    return None
+
+
 @dataclasses.dataclass
 class Controller:
     control_connection: tuple[asyncio.StreamReader, asyncio.StreamWriter]
-    queue: asyncio.Queue[
-        symmetrical_doodle.tasks.Task[symmetrical_doodle.control_message.ControlMessage]
-    ] = dataclasses.field(default_factory=asyncio.Queue, init=False)
+    queue: symmetrical_doodle.control_queues.ControlQueue = dataclasses.field(
+        default_factory=symmetrical_doodle.control_queues.ControlQueue, init=False
+    )
+
+    coalesce_moves: bool = True
+    """replace the pending moves of a pointer by the latest one"""
+    max_move_rate: Optional[float] = None
+    """the maximum number of moves per second sent for each pointer"""
+
+    serializer: symmetrical_doodle.control_message.Serializer = dataclasses.field(
+        default_factory=symmetrical_doodle.control_message.Serializer, init=False
+    )
+    batch_sizes: collections.Counter[int] = dataclasses.field(
+        default_factory=collections.Counter, init=False
+    )
+    """the number of writes by number of messages written at once"""
+    collapsed: int = dataclasses.field(default=0, init=False)
+    """the number of moves replaced by a later one"""
+
+    watermark: symmetrical_doodle.tasks.Watermark = dataclasses.field(
+        default_factory=symmetrical_doodle.tasks.Watermark, init=False
+    )
+
+    held: dict[int, symmetrical_doodle.control_queues.ControlTask] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+    """the latest move of each pointer, held back by the rate limit"""
+    move_times: dict[int, float] = dataclasses.field(default_factory=dict, init=False)
+    """the time the last move of each pointer was sent"""
+
+    def create_task(
+        self,
+        message: symmetrical_doodle.control_message.ControlMessage,
+        event: Optional[asyncio.Event] = None,
+    ):
+        return symmetrical_doodle.tasks.Task(
+            message, event, self.watermark.next(), self.watermark
+        )
+
+    def put_nowait(self, task: symmetrical_doodle.control_queues.ControlTask):
+        try:
+            self.queue.put_nowait(task)
+        except asyncio.QueueFull:
+            # not queued, its sequence number must not hold the watermark
+            task.complete()
+            raise
 
     async def push_message(
         self, message: symmetrical_doodle.control_message.ControlMessage
     ):
-        task = symmetrical_doodle.tasks.Task(message)
-        await self.queue.put(task)
-        return task.event
+        event = asyncio.Event()
+        task = self.create_task(message, event)
+        try:
+            await self.queue.put(task)
+        except BaseException:
+            # not queued, its sequence number must not hold the watermark
+            task.complete()
+            raise
+        return event
 
     def push_message_nowait(
         self, message: symmetrical_doodle.control_message.ControlMessage
     ):
-        task = symmetrical_doodle.tasks.Task(message)
-        self.queue.put_nowait(task)
-        return task.event
+        event = asyncio.Event()
+        self.put_nowait(self.create_task(message, event))
+        return event
+
+    def post(self, message: symmetrical_doodle.control_message.ControlMessage):
+        """Queues a message without allocating an event, and returns its
+        sequence number for wait_flushed()."""
+        task = self.create_task(message)
+        self.put_nowait(task)
+        return task.sequence
+
+    async def push_messages(
+        self, messages: Sequence[symmetrical_doodle.control_message.ControlMessage]
+    ):
+        """Queues messages as a unit, so that they are written in the same
+        batch, and returns the sequence number of the last one."""
+        tasks = [self.create_task(message) for message in messages]
+        try:
+            await self.queue.put_many(tasks)
+        except BaseException:
+            # not queued, their sequence numbers must not hold the watermark
+            for task in tasks:
+                task.complete()
+            raise
+        return tasks[-1].sequence
+
+    @property
+    def flushed(self):
+        """The sequence number up to which all the messages are written (or
+        dropped)."""
+        return self.watermark.value
+
+    async def wait_flushed(self, sequence: int):
+        await self.watermark.wait(sequence)
 
     async def send_message(
         self, message: symmetrical_doodle.control_message.ControlMessage
@@ -35,8 +125,130 @@ class Controller:
         await writer.drain()
         asyncio.Task
 
+    def get_queued(self):
+        """Takes all the tasks already queued, without waiting."""
+        tasks: list[symmetrical_doodle.control_queues.ControlTask] = []
+        while True:
+            try:
+                tasks.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return tasks
+
+    def get_hold_timeout(self, now: float):
+        """Returns the delay until a held move may be sent, or None."""
+        if not self.held or self.max_move_rate is None:
+            return None
+        interval = 1 / self.max_move_rate
+        return max(
+            0.0,
+            min(self.move_times[pointer_id] + interval for pointer_id in self.held)
+            - now,
+        )
+
+    async def get_tasks(self):
+        """Waits for tasks, or for a held move to be sendable."""
+        loop = asyncio.get_running_loop()
+        timeout = self.get_hold_timeout(loop.time())
+        tasks: list[symmetrical_doodle.control_queues.ControlTask] = []
+        if timeout is None:
+            tasks.append(await self.queue.get())
+        else:
+            try:
+                tasks.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                pass
+        tasks.extend(self.get_queued())
+        return tasks
+
+    def coalesce(self, tasks: list[symmetrical_doodle.control_queues.ControlTask]):
+        """Drops the moves followed by another move of the same pointer, with
+        no other event of the pointer in between."""
+        kept: list[Optional[symmetrical_doodle.control_queues.ControlTask]] = []
+        # the index in kept of the last move of each pointer
+        moves: dict[int, int] = {}
+        for task in tasks:
+            pointer_id = get_pointer_id(task.todo)
+            if pointer_id is not None:
+                if symmetrical_doodle.control_queues.is_move(task.todo):
+                    index = moves.get(pointer_id)
+                    if index is not None:
+                        collapsed = kept[index]
+                        assert collapsed is not None
+                        kept[index] = None
+                        collapsed.complete()
+                        self.collapsed += 1
+                    moves[pointer_id] = len(kept)
+                else:
+                    moves.pop(pointer_id, None)
+            kept.append(task)
+        return [task for task in kept if task is not None]
+
+    def limit_rate(
+        self, tasks: list[symmetrical_doodle.control_queues.ControlTask], now: float
+    ):
+        """Holds back the moves sent too early after the previous move of the
+        same pointer, unless another event of the pointer follows them."""
+        if self.max_move_rate is None:
+            return tasks
+        interval = 1 / self.max_move_rate
+        last_events: dict[int, symmetrical_doodle.control_queues.ControlTask] = {}
+        for task in tasks:
+            pointer_id = get_pointer_id(task.todo)
+            if pointer_id is not None:
+                last_events[pointer_id] = task
+        sent: list[symmetrical_doodle.control_queues.ControlTask] = []
+        for task in tasks:
+            pointer_id = get_pointer_id(task.todo)
+            if pointer_id is not None and symmetrical_doodle.control_queues.is_move(
+                task.todo
+            ):
+                move_time = self.move_times.get(pointer_id)
+                if (
+                    move_time is not None
+                    and now - move_time < interval
+                    and last_events[pointer_id] is task
+                ):
+                    self.held[pointer_id] = task
+                    continue
+                self.move_times[pointer_id] = now
+            sent.append(task)
+        return sent
+
+    def schedule(
+        self, tasks: list[symmetrical_doodle.control_queues.ControlTask], now: float
+    ):
+        """Returns the tasks to send now, after coalescing and rate limiting."""
+        # the held moves are older than the new tasks
+        tasks = [*self.held.values(), *tasks]
+        self.held = {}
+        if self.coalesce_moves:
+            tasks = self.coalesce(tasks)
+        return self.limit_rate(tasks, now)
+
+    async def send_batch(
+        self, tasks: list[symmetrical_doodle.control_queues.ControlTask]
+    ):
+        if not tasks:
+            return
+        data = self.serializer.serialize([task.todo for task in tasks])
+        _, writer = self.control_connection
+        # a copy, the transport may keep the data while the buffer is reused
+        writer.write(bytes(data))
+        await writer.drain()
+        self.batch_sizes[len(tasks)] += 1
+        for task in tasks:
+            task.complete()
+
+    def get_mean_batch_size(self):
+        writes = self.batch_sizes.total()
+        if not writes:
+            return 0.0
+        return sum(size * count for size, count in self.batch_sizes.items()) / writes
+
     async def run(self):
+        loop = asyncio.get_running_loop()
         while True:
-            task = await self.queue.get()
-            await self.send_message(task.todo)
-            task.event.set()
+            # the messages queued while the previous write was drained are
+            # written at once
+            tasks = await self.get_tasks()
+            await self.send_batch(self.schedule(tasks, loop.time()))
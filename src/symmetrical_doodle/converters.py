@@ -0,0 +1,113 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+from typing import Optional
+
+import av
+import av.video.reformatter
+import numpy
+
+# the number of bytes per pixel of the supported packed formats
+CHANNELS = {"rgb24": 3, "bgr24": 3, "rgba": 4, "bgra": 4, "gray": 1}
+
+Image = numpy.ndarray[tuple[int, int, int], numpy.dtype[numpy.uint8]]
+
+# AVColorSpace and AVColorRange values
+AVCOL_SPC_BT709 = 1
+AVCOL_SPC_BT470BG = 5
+AVCOL_SPC_SMPTE170M = 6
+AVCOL_RANGE_JPEG = 2
+
+# (Kr, Kb)
+BT601 = (0.299, 0.114)
+BT709 = (0.2126, 0.0722)
+
+
+def get_yuv_to_rgb_matrix(colorspace: int, color_range: int, height: int):
+    """Returns the row-major 3x3 matrix and the offset to apply to normalized
+    YUV samples, such that rgb = matrix * (yuv - offset).
+
+    Unspecified colorspaces are guessed from the frame height, like FFmpeg does.
+    """
+    if colorspace == AVCOL_SPC_BT709:
+        kr, kb = BT709
+    elif colorspace in (AVCOL_SPC_BT470BG, AVCOL_SPC_SMPTE170M):
+        kr, kb = BT601
+    elif height <= 576:
+        kr, kb = BT601
+    else:
+        kr, kb = BT709
+    kg = 1 - kr - kb
+
+    if color_range == AVCOL_RANGE_JPEG:
+        y_scale = 1.0
+        uv_scale = 1.0
+        y_offset = 0.0
+    else:
+        y_scale = 255 / 219
+        uv_scale = 255 / 224
+        y_offset = 16 / 255
+
+    matrix = (
+        (y_scale, 0.0, 2 * (1 - kr) * uv_scale),
+        (
+            y_scale,
+            -2 * kb * (1 - kb) / kg * uv_scale,
+            -2 * kr * (1 - kr) / kg * uv_scale,
+        ),
+        (y_scale, 2 * (1 - kb) * uv_scale, 0.0),
+    )
+    offset = (y_offset, 128 / 255, 128 / 255)
+    return matrix, offset
+
+
+@dataclasses.dataclass
+class FrameConverter:
+    """Converts frames to packed images on a worker thread.
+
+    The swscale context is cached by a single VideoReformatter. The images are
+    views of the frames it outputs, so nothing is copied after the conversion
+    unless a destination array is given.
+    """
+
+    format: str = "rgb24"
+
+    reformatter: av.video.reformatter.VideoReformatter = dataclasses.field(
+        default_factory=av.video.reformatter.VideoReformatter, init=False
+    )
+
+    executor: Optional[concurrent.futures.ThreadPoolExecutor] = dataclasses.field(
+        default=None, init=False
+    )
+
+    @property
+    def channels(self):
+        return CHANNELS[self.format]
+
+    def convert_nowait(self, frame: av.VideoFrame, image: Optional[Image] = None):
+        """Converts a frame on the calling thread.
+
+        The result is a view of the converted frame, whose rows may be padded,
+        unless an array with the shape of the frame is given to be written.
+        """
+        converted = self.reformatter.reformat(frame, format=self.format).to_ndarray()
+        if image is None:
+            return converted
+        numpy.copyto(image, converted)
+        return image
+
+    async def convert(self, frame: av.VideoFrame, image: Optional[Image] = None):
+        if self.executor is None:
+            # a single worker, the reformatter is not thread-safe
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="converter"
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.convert_nowait, frame, image
+        )
+
+    def close(self, wait: bool = False):
+        """Stops the worker thread, waiting for a pending conversion if wait."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
@@ -1,17 +1,23 @@
 import asyncio
+import concurrent.futures
 import dataclasses
+from typing import Optional
 
 import av
+import av.codec.context
 
+import symmetrical_doodle.packet_queues
 import symmetrical_doodle.packets
+import symmetrical_doodle.sinks
+import symmetrical_doodle.tracing
 
 
 @dataclasses.dataclass
 class Decoder:
-    packet_sink: asyncio.Queue[
-        symmetrical_doodle.packets.VideoCodecContext | symmetrical_doodle.packets.Packet
-    ] = dataclasses.field(default_factory=asyncio.Queue, init=False)
-    sinks: list[asyncio.Queue[av.VideoFrame]] = dataclasses.field(
+    packet_sink: symmetrical_doodle.packet_queues.PacketQueue = dataclasses.field(
+        default_factory=symmetrical_doodle.packet_queues.PacketQueue
+    )
+    sinks: list[symmetrical_doodle.sinks.Sink[av.VideoFrame]] = dataclasses.field(
         default_factory=list, init=False
     )
 
@@ -19,24 +25,79 @@ class Decoder:
         default=None, init=False
     )
 
+    threaded: bool = False
+    """decode on a dedicated worker thread instead of the event loop thread"""
+    thread_count: int = 0
+    thread_type: av.codec.context.ThreadType | str | None = None
+
+    executor: Optional[concurrent.futures.ThreadPoolExecutor] = dataclasses.field(
+        default=None, init=False
+    )
+
+    tracer: Optional[symmetrical_doodle.tracing.Tracer] = None
+
+    delay: int = dataclasses.field(default=0, init=False)
+    """the number of packets sent whose frame has not been received yet"""
+    max_delay: int = dataclasses.field(default=0, init=False)
+
+    async def decode(self, packet: av.Packet | None):
+        """Decodes a packet, or drains the codec if packet is None."""
+        codec_context = self.codec_context
+        assert codec_context is not None
+        if not self.threaded:
+            return codec_context.decode(packet)
+
+        if self.executor is None:
+            # a single worker keeps the packets in order
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="decoder"
+            )
+        # PyAV releases the GIL while decoding
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, codec_context.decode, packet
+        )
+
     async def push(self, packet: symmetrical_doodle.packets.Packet):
         is_config = packet.pts is None
         if is_config:
             return
 
-        codec_context = self.codec_context
-        assert codec_context is not None
-        frames = codec_context.decode(packet.create_av_packet())
-        assert len(frames) == 1
-        frame = frames[0]
+        # a packet may produce any number of frames, for example with frame
+        # threading or when the codec buffers frames
+        frames = await self.decode(packet.create_av_packet())
+        self.delay += 1 - len(frames)
+        self.max_delay = max(self.max_delay, self.delay)
+
+        await self.push_frames(frames)
 
-        for sink in self.sinks:
-            await sink.put(frame)
+    async def push_frames(self, frames: list[av.VideoFrame]):
+        if frames:
+            symmetrical_doodle.tracing.mark_once(self.tracer, "first frame")
+        for frame in frames:
+            for sink in self.sinks:
+                await sink.put(frame)
+
+    async def drain(self):
+        if self.codec_context is None:
+            return
+        frames = await self.decode(None)
+        self.delay = 0
+        await self.push_frames(frames)
 
     async def run(self):
-        while True:
-            item = await self.packet_sink.get()
-            if isinstance(item, symmetrical_doodle.packets.VideoCodecContext):
-                self.codec_context = item.create_av_codec_context()
-            else:
-                await self.push(item)
+        try:
+            while True:
+                item = await self.packet_sink.get()
+                if isinstance(item, symmetrical_doodle.packets.VideoCodecContext):
+                    self.codec_context = item.create_av_codec_context(
+                        self.thread_count, self.thread_type
+                    )
+                elif isinstance(item, symmetrical_doodle.packets.EndOfStream):
+                    await self.drain()
+                    return
+                else:
+                    await self.push(item)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
@@ -0,0 +1,50 @@
+import asyncio
+import dataclasses
+import time
+from typing import Optional
+
+import av
+
+import symmetrical_doodle.sinks
+
+
+@dataclasses.dataclass
+class DelayBuffer:
+    """Delays frames by a fixed duration to compensate for jitter.
+
+    Frame pts are expressed in microseconds, like the packets sent by the
+    server. They are mapped to the local monotonic clock using the smallest
+    offset observed so far, so that frames received late are not delayed
+    further.
+    """
+
+    delay: int
+    """the buffering delay, in microseconds"""
+
+    queue: asyncio.Queue[av.VideoFrame] = dataclasses.field(
+        default_factory=asyncio.Queue, init=False
+    )
+    sinks: list[symmetrical_doodle.sinks.Sink[av.VideoFrame]] = dataclasses.field(
+        default_factory=list, init=False
+    )
+
+    offset: Optional[int] = dataclasses.field(default=None, init=False)
+
+    async def put(self, frame: av.VideoFrame):
+        self.queue.put_nowait(frame)
+
+    async def run(self):
+        while True:
+            frame = await self.queue.get()
+            pts = frame.pts
+            if pts is not None:
+                now = time.monotonic_ns() // 1000
+                offset = now - pts
+                if self.offset is None or offset < self.offset:
+                    self.offset = offset
+                deadline = pts + self.offset + self.delay
+                if deadline > now:
+                    await asyncio.sleep((deadline - now) / 1000000)
+
+            for sink in self.sinks:
+                await sink.put(frame)
@@ -1,14 +1,21 @@
 import asyncio
 import dataclasses
 import enum
+import logging
+from typing import Optional
 
 import av.codec
 import av.codec.context
 
+import symmetrical_doodle.buffered_readers
 import symmetrical_doodle.packet_mergers
 import symmetrical_doodle.packets
+import symmetrical_doodle.sinks
+import symmetrical_doodle.tracing
 import symmetrical_doodle.utils.buffer
 
+logger = logging.getLogger(__name__)
+
 PACKET_HEADER_SIZE = 12
 
 PACKET_FLAG_CONFIG = 1 << 63
@@ -47,11 +54,13 @@ def to_av_codec_id(codec_id: int):
 @dataclasses.dataclass
 class Demuxer:
     connection: tuple[asyncio.StreamReader, asyncio.StreamWriter]
+    tracer: Optional[symmetrical_doodle.tracing.Tracer] = None
 
     sinks: list[
-        asyncio.Queue[
+        symmetrical_doodle.sinks.Sink[
             symmetrical_doodle.packets.VideoCodecContext
             | symmetrical_doodle.packets.Packet
+            | symmetrical_doodle.packets.EndOfStream
         ]
     ] = dataclasses.field(default_factory=list, init=False)
 
@@ -59,14 +68,25 @@ class Demuxer:
         default=None, init=False
     )
 
+    reader: symmetrical_doodle.buffered_readers.BufferedReader | None = (
+        dataclasses.field(default=None, init=False)
+    )
+
+    async def get_reader(self):
+        if self.reader is None:
+            self.reader = await symmetrical_doodle.buffered_readers.take_over(
+                self.connection
+            )
+        return self.reader
+
     async def receive_codec_id(self):
-        reader, _ = self.connection
+        reader = await self.get_reader()
         return symmetrical_doodle.utils.buffer.read32be(await reader.readexactly(4), 0)[
             0
         ]
 
     async def receive_video_size(self):
-        reader, _ = self.connection
+        reader = await self.get_reader()
         data = await reader.readexactly(8)
         start = 0
         width, start = symmetrical_doodle.utils.buffer.read32be(data, start)
@@ -75,6 +95,7 @@ class Demuxer:
 
     async def run(self):
         raw_codec_id = await self.receive_codec_id()
+        symmetrical_doodle.tracing.mark_once(self.tracer, "codec id")
         assert raw_codec_id not in (0, 1)
         codec_id = to_av_codec_id(raw_codec_id)
         assert codec_id is not None
@@ -94,7 +115,7 @@ class Demuxer:
         await self.push_item_to_sinks(context)
 
         must_merge_config_packet = (
-            raw_codec_id == CodecID.H264.value or raw_codec_id == CodecID.H265
+            raw_codec_id == CodecID.H264.value or raw_codec_id == CodecID.H265.value
         )
 
         merger = (
@@ -104,14 +125,29 @@ class Demuxer:
         )
 
         while True:
-            packet = await self.receive_packet()
-            if must_merge_config_packet:
-                assert merger is not None
-                merger.merge(packet)
+            try:
+                packet = await self.receive_packet(merger)
+            except asyncio.IncompleteReadError:
+                break
+            except ConnectionError as e:
+                # the sinks must still be drained
+                logger.warning("Video connection lost: %s", e)
+                break
+            if packet.pts is not None:
+                symmetrical_doodle.tracing.mark_once(self.tracer, "first packet")
             await self.push_item_to_sinks(packet)
 
-    async def receive_packet(self):
-        reader, _ = self.connection
+        await self.push_item_to_sinks(symmetrical_doodle.packets.EndOfStream())
+
+    async def receive_packet(
+        self, merger: symmetrical_doodle.packet_mergers.Merger | None = None
+    ):
+        """Receives a packet directly into the buffer of an av.Packet.
+
+        If a merger is given, the pending config is written in front of the
+        payload instead of being concatenated afterwards.
+        """
+        reader = await self.get_reader()
         header = await reader.readexactly(PACKET_HEADER_SIZE)
 
         start = 0
@@ -119,10 +155,15 @@ class Demuxer:
         length, start = symmetrical_doodle.utils.buffer.read32be(header, start)
         assert length
 
-        data = await reader.readexactly(length)
-        packet = symmetrical_doodle.packets.Packet(data)
+        is_config = bool(pts_flags & PACKET_FLAG_CONFIG)
+        config = b"" if merger is None else merger.take_config(is_config)
 
-        if pts_flags & PACKET_FLAG_CONFIG:
+        packet = symmetrical_doodle.packets.allocate_packet(len(config) + length)
+        assert isinstance(packet.input, memoryview)
+        packet.input[: len(config)] = config
+        await reader.readinto(packet.input[len(config) :])
+
+        if is_config:
             packet.pts = None
         else:
             packet.pts = pts_flags & PACKET_PTS_MASK
@@ -132,6 +173,9 @@ class Demuxer:
 
         packet.dts = packet.pts
 
+        if merger is not None and is_config:
+            merger.merge(packet)
+
         return packet
 
     async def push_item_to_sinks(
@@ -139,6 +183,7 @@ class Demuxer:
         item: (
             symmetrical_doodle.packets.VideoCodecContext
             | symmetrical_doodle.packets.Packet
+            | symmetrical_doodle.packets.EndOfStream
         ),
     ):
         for sink in self.sinks:
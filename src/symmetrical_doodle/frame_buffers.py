@@ -0,0 +1,46 @@
+import asyncio
+import dataclasses
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass
+class FrameBuffer(Generic[T]):
+    """Keeps only the newest frame which has not been consumed yet.
+
+    Pushing never blocks: a pending frame is replaced and counted as skipped.
+    """
+
+    pending: Optional[T] = dataclasses.field(default=None, init=False)
+    skipped: int = dataclasses.field(default=0, init=False)
+    event: asyncio.Event = dataclasses.field(default_factory=asyncio.Event, init=False)
+
+    def put_nowait(self, frame: T):
+        assert frame is not None
+        if self.pending is not None:
+            self.skipped += 1
+        self.pending = frame
+        self.event.set()
+
+    async def put(self, frame: T):
+        self.put_nowait(frame)
+
+    def get_nowait(self):
+        frame = self.pending
+        if frame is None:
+            raise asyncio.QueueEmpty
+        self.pending = None
+        self.event.clear()
+        return frame
+
+    async def get(self):
+        while self.pending is None:
+            await self.event.wait()
+        return self.get_nowait()
+
+    def consume_skipped(self):
+        """Returns the number of skipped frames since the last call."""
+        skipped = self.skipped
+        self.skipped = 0
+        return skipped
@@ -0,0 +1,301 @@
+import asyncio
+import dataclasses
+import itertools
+import math
+from typing import Callable
+
+import symmetrical_doodle.android.input
+import symmetrical_doodle.control_message
+import symmetrical_doodle.controllers
+import symmetrical_doodle.coords
+
+ACTION_DOWN = (
+    symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_DOWN
+)
+ACTION_UP = symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_UP
+ACTION_MOVE = (
+    symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_MOVE
+)
+
+DEFAULT_INTERVAL = 0.005
+LONG_PRESS_DURATION = 0.8
+
+Easing = Callable[[float], float]
+
+
+def linear(t: float):
+    return t
+
+
+def ease_in(t: float):
+    return t * t * t
+
+
+def ease_out(t: float):
+    return 1 - (1 - t) ** 3
+
+
+def ease_in_out(t: float):
+    if t < 0.5:
+        return 4 * t * t * t
+    return 1 - (-2 * t + 2) ** 3 / 2
+
+
+def lerp(a: float, b: float, alpha: float):
+    return (b - a) * alpha + a
+
+
+def get_steps(duration: float, interval: float):
+    """Returns the times of the moves, from the start of a motion, excluding
+    its start and end."""
+    # rounded first, so that the float error of an exact multiple, like
+    # 0.07 / 0.01, does not add a step at the end
+    count = math.ceil(round(duration / interval, 6))
+    return [i * interval for i in range(1, count)]
+
+
+@dataclasses.dataclass
+class Event:
+    time: float
+    """seconds from the start of the gesture"""
+    message: symmetrical_doodle.control_message.InjectTouchEvent
+
+
+@dataclasses.dataclass
+class Timeline:
+    """The touch events of a gesture, precomputed before it is played.
+
+    The mouse pointer is the first finger, and the virtual finger the second
+    one, like the pinch-to-zoom of scrcpy.
+    """
+
+    screen_size: symmetrical_doodle.coords.Size
+
+    events: list[Event] = dataclasses.field(default_factory=list, init=False)
+
+    @property
+    def duration(self):
+        return max((event.time for event in self.events), default=0.0)
+
+    def add(
+        self,
+        time: float,
+        action: symmetrical_doodle.android.input.MotionEventAction,
+        pointer_id: int,
+        x: float,
+        y: float,
+    ):
+        if pointer_id == symmetrical_doodle.control_message.POINTER_ID_MOUSE:
+            buttons = (
+                symmetrical_doodle.android.input.MotionEventButton.AMOTION_EVENT_BUTTON_PRIMARY.value
+            )
+        else:
+            buttons = 0
+        message = symmetrical_doodle.control_message.InjectTouchEvent(
+            action=action,
+            buttons=buttons,
+            pointer_id=pointer_id,
+            position=symmetrical_doodle.coords.Position(
+                self.screen_size, symmetrical_doodle.coords.Point(round(x), round(y))
+            ),
+            pressure=0.0 if action == ACTION_UP else 1.0,
+        )
+        self.events.append(Event(time, message))
+
+    def tap(
+        self,
+        x: float,
+        y: float,
+        start: float = 0.0,
+        duration: float = 0.0,
+        pointer_id: int = symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+    ):
+        """A down and an up, in the same write if duration is 0."""
+        self.add(start, ACTION_DOWN, pointer_id, x, y)
+        self.add(start + duration, ACTION_UP, pointer_id, x, y)
+        return self
+
+    def long_press(
+        self,
+        x: float,
+        y: float,
+        start: float = 0.0,
+        duration: float = LONG_PRESS_DURATION,
+        pointer_id: int = symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+    ):
+        return self.tap(x, y, start, duration, pointer_id)
+
+    def move(
+        self,
+        pointer_id: int,
+        get_point: Callable[[float], tuple[float, float]],
+        start: float,
+        duration: float,
+        interval: float = DEFAULT_INTERVAL,
+        easing: Easing = linear,
+        up: bool = True,
+    ):
+        """Adds a down, the moves along get_point(progress) for progress from 0
+        to 1, and an up unless up is False, for the gestures which lift their
+        fingers only after all of them reached their end points."""
+        self.add(start, ACTION_DOWN, pointer_id, *get_point(0.0))
+        for time in get_steps(duration, interval):
+            self.add(
+                start + time,
+                ACTION_MOVE,
+                pointer_id,
+                *get_point(easing(time / duration)),
+            )
+        end = start + duration
+        if duration > 0:
+            # the end point is reached before the finger is lifted
+            self.add(end, ACTION_MOVE, pointer_id, *get_point(1.0))
+        if up:
+            self.add(end, ACTION_UP, pointer_id, *get_point(1.0))
+        return self
+
+    def swipe(
+        self,
+        x1: float,
+        y1: float,
+        x2: float,
+        y2: float,
+        start: float = 0.0,
+        duration: float = 0.3,
+        interval: float = DEFAULT_INTERVAL,
+        easing: Easing = linear,
+        pointer_id: int = symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+    ):
+        return self.move(
+            pointer_id,
+            lambda alpha: (lerp(x1, x2, alpha), lerp(y1, y2, alpha)),
+            start,
+            duration,
+            interval,
+            easing,
+        )
+
+    def two_fingers(
+        self,
+        x: float,
+        y: float,
+        start_distance: float,
+        end_distance: float,
+        start_angle: float,
+        end_angle: float,
+        start: float = 0.0,
+        duration: float = 0.5,
+        interval: float = DEFAULT_INTERVAL,
+        easing: Easing = linear,
+    ):
+        """Moves two fingers symmetrically around a center, from a distance
+        and an angle (in radians) to others."""
+
+        def get_finger(sign: int):
+            def get_point(alpha: float):
+                radius = lerp(start_distance, end_distance, alpha) / 2 * sign
+                angle = lerp(start_angle, end_angle, alpha)
+                return x + radius * math.cos(angle), y + radius * math.sin(angle)
+
+            return get_point
+
+        fingers = [
+            (symmetrical_doodle.control_message.POINTER_ID_MOUSE, get_finger(1)),
+            (
+                symmetrical_doodle.control_message.POINTER_ID_VIRTUAL_FINGER,
+                get_finger(-1),
+            ),
+        ]
+        for pointer_id, get_point in fingers:
+            self.move(
+                pointer_id, get_point, start, duration, interval, easing, up=False
+            )
+        # both fingers reach their end points before either is lifted
+        for pointer_id, get_point in fingers:
+            self.add(start + duration, ACTION_UP, pointer_id, *get_point(1.0))
+        return self
+
+    def pinch(
+        self,
+        x: float,
+        y: float,
+        start_distance: float,
+        end_distance: float,
+        angle: float = 0.0,
+        start: float = 0.0,
+        duration: float = 0.5,
+        interval: float = DEFAULT_INTERVAL,
+        easing: Easing = linear,
+    ):
+        """Zooms in if end_distance is larger than start_distance, out
+        otherwise."""
+        return self.two_fingers(
+            x,
+            y,
+            start_distance,
+            end_distance,
+            angle,
+            angle,
+            start,
+            duration,
+            interval,
+            easing,
+        )
+
+    def rotate(
+        self,
+        x: float,
+        y: float,
+        distance: float,
+        start_angle: float,
+        end_angle: float,
+        start: float = 0.0,
+        duration: float = 0.5,
+        interval: float = DEFAULT_INTERVAL,
+        easing: Easing = linear,
+    ):
+        return self.two_fingers(
+            x,
+            y,
+            distance,
+            distance,
+            start_angle,
+            end_angle,
+            start,
+            duration,
+            interval,
+            easing,
+        )
+
+    def get_batches(self):
+        """Returns the messages grouped by time, in order.
+
+        The events at the same time keep the order they were added in, so
+        that a finger down comes before its moves.
+        """
+        events = sorted(self.events, key=lambda event: event.time)
+        return [
+            (time, [event.message for event in group])
+            for time, group in itertools.groupby(events, key=lambda event: event.time)
+        ]
+
+
+async def play(
+    controller: symmetrical_doodle.controllers.Controller, timeline: Timeline
+):
+    """Queues the events of a timeline to a running controller, those at the
+    same time as a unit, and waits until they are all written.
+
+    The deadlines are computed from the start on the monotonic clock of the
+    event loop, so a late batch does not delay the following ones.
+    """
+    loop = asyncio.get_running_loop()
+    origin = loop.time()
+    sequence = None
+    for time, messages in timeline.get_batches():
+        delay = origin + time - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sequence = await controller.push_messages(messages)
+    if sequence is not None:
+        await controller.wait_flushed(sequence)
@@ -106,6 +106,7 @@ class Options:
     codec_options: Optional[str] = None
     encoder_name: Optional[str] = None
     v4l2_device: Optional[str] = None
+    startup_report: Optional[str] = None
     log_level: LogLevel = LogLevel.INFO
     record_format: RecordFormat = RecordFormat.AUTO
     keyboard_input_mode: KeyboardInputMode = KeyboardInputMode.INJECT
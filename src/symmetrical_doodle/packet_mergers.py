@@ -5,14 +5,22 @@ import symmetrical_doodle.packets
 
 @dataclasses.dataclass
 class Merger:
-    config: bytes | None = dataclasses.field(default=None, init=False)
+    config: bytes | memoryview | None = dataclasses.field(default=None, init=False)
+
+    def take_config(self, is_config: bool):
+        """Returns the config to prepend to the next packet payload."""
+        config = self.config
+        if is_config or config is None:
+            return b""
+        self.config = None
+        return config
 
     def merge(self, packet: symmetrical_doodle.packets.Packet):
         is_config = packet.pts is None
-        config = self.config
         if is_config:
-            config = packet.input
-        elif config is not None:
-            packet.input = config + packet.input
-            config = None
-        self.config = config
+            self.config = packet.input
+        else:
+            config = self.take_config(is_config)
+            if config:
+                packet.input = b"".join((config, packet.input))
+                packet.av_packet = None
@@ -0,0 +1,148 @@
+import asyncio
+import collections
+import dataclasses
+import enum
+
+import symmetrical_doodle.packets
+
+Item = (
+    symmetrical_doodle.packets.VideoCodecContext
+    | symmetrical_doodle.packets.Packet
+    | symmetrical_doodle.packets.EndOfStream
+)
+
+
+class OverflowPolicy(enum.Enum):
+    BLOCK = 0
+    """wait for the consumer, stalling the producer"""
+    DROP_NON_KEY = enum.auto()
+    """drop packets until the next key frame"""
+    DROP_OLDEST = enum.auto()
+    """drop the oldest queued packet"""
+
+
+def is_droppable(item: Item):
+    # codec contexts, config packets and the end of stream must always be
+    # delivered
+    return isinstance(item, symmetrical_doodle.packets.Packet) and item.pts is not None
+
+
+def is_key_frame(item: Item):
+    return (
+        isinstance(item, symmetrical_doodle.packets.Packet)
+        and item.flags & symmetrical_doodle.packets.AV_PKT_FLAG_KEY != 0
+    )
+
+
+@dataclasses.dataclass
+class PacketQueue:
+    """A packet sink with a bound and a policy applied when it is full.
+
+    A maxsize of 0 means unbounded.
+    """
+
+    maxsize: int = 0
+    policy: OverflowPolicy = OverflowPolicy.BLOCK
+
+    items: collections.deque[Item] = dataclasses.field(
+        default_factory=collections.deque, init=False
+    )
+
+    dropped: int = dataclasses.field(default=0, init=False)
+    """the number of packets dropped so far"""
+    max_depth: int = dataclasses.field(default=0, init=False)
+    """the maximum number of items queued so far"""
+
+    waiting_for_key_frame: bool = dataclasses.field(default=False, init=False)
+
+    not_empty: asyncio.Event = dataclasses.field(
+        default_factory=asyncio.Event, init=False
+    )
+    not_full: asyncio.Event = dataclasses.field(
+        default_factory=asyncio.Event, init=False
+    )
+
+    def __post_init__(self):
+        self.not_full.set()
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def full(self):
+        return 0 < self.maxsize <= len(self.items)
+
+    def append(self, item: Item):
+        self.items.append(item)
+        self.max_depth = max(self.max_depth, len(self.items))
+        self.not_empty.set()
+        if self.full():
+            self.not_full.clear()
+
+    def updated(self):
+        if not self.items:
+            self.not_empty.clear()
+        if not self.full():
+            self.not_full.set()
+
+    def drop_oldest(self):
+        for i, item in enumerate(self.items):
+            if is_droppable(item):
+                del self.items[i]
+                self.dropped += 1
+                self.updated()
+                return
+
+    def drop_all(self):
+        items = collections.deque(item for item in self.items if not is_droppable(item))
+        self.dropped += len(self.items) - len(items)
+        self.items = items
+        self.updated()
+
+    def put_nowait(self, item: Item):
+        if not is_droppable(item):
+            self.append(item)
+            return
+
+        if self.policy is OverflowPolicy.BLOCK:
+            if self.full():
+                raise asyncio.QueueFull
+        elif self.policy is OverflowPolicy.DROP_NON_KEY:
+            key_frame = is_key_frame(item)
+            if self.waiting_for_key_frame and not key_frame:
+                self.dropped += 1
+                return
+            if self.full():
+                if not key_frame:
+                    # the following packets depend on this one
+                    self.waiting_for_key_frame = True
+                    self.dropped += 1
+                    return
+                # the key frame makes the queued packets useless
+                self.drop_all()
+            self.waiting_for_key_frame = False
+        elif self.policy is OverflowPolicy.DROP_OLDEST:
+            if self.full():
+                self.drop_oldest()
+
+        self.append(item)
+
+    async def put(self, item: Item):
+        if self.policy is OverflowPolicy.BLOCK and is_droppable(item):
+            while self.full():
+                await self.not_full.wait()
+        self.put_nowait(item)
+
+    def get_nowait(self):
+        if not self.items:
+            raise asyncio.QueueEmpty
+        item = self.items.popleft()
+        self.updated()
+        return item
+
+    async def get(self):
+        while not self.items:
+            await self.not_empty.wait()
+        return self.get_nowait()
@@ -1,5 +1,5 @@
 import dataclasses
-from typing import Any
+from typing import Any, cast
 
 import av
 import av.codec
@@ -14,10 +14,16 @@ class Packet:
     dts: Any = dataclasses.field(default=None, init=False)
     flags: Any = dataclasses.field(default=0, init=False)
 
-    input: bytes = dataclasses.field(default=b"")
+    input: bytes | memoryview = dataclasses.field(default=b"")
+
+    # the packet owning input, if input was received directly into it
+    av_packet: av.Packet | None = dataclasses.field(default=None, init=False)
 
     def create_av_packet(self):
-        packet = av.Packet(self.input)
+        packet = self.av_packet
+        if packet is None:
+            # av.Packet copies from any buffer, its stub only says bytes
+            packet = av.Packet(cast(bytes, self.input))
         packet.pts = self.pts
         packet.dts = self.dts
         return packet
@@ -27,6 +33,19 @@ class Packet:
         return len(self.input)
 
 
+@dataclasses.dataclass
+class EndOfStream:
+    """Pushed to the packet sinks when the stream ends."""
+
+
+def allocate_packet(size: int):
+    """Creates a packet whose input is a writable view of a new av.Packet."""
+    av_packet = av.Packet(size)
+    packet = Packet(memoryview(av_packet))
+    packet.av_packet = av_packet
+    return packet
+
+
 @dataclasses.dataclass
 class VideoCodecContext:
     codec: av.codec.Codec
@@ -35,11 +54,24 @@ class VideoCodecContext:
     height: int
     pix_fmt: str
 
-    def create_av_codec_context(self):
+    def create_av_codec_context(
+        self,
+        thread_count: int = 0,
+        thread_type: av.codec.context.ThreadType | str | None = None,
+    ):
+        """Creates the codec context.
+
+        thread_count and thread_type configure FFmpeg threading (frame or slice
+        threading); they are left to the FFmpeg defaults if not given.
+        """
         context = av.codec.context.CodecContext.create(self.codec)
         assert isinstance(context, av.VideoCodecContext)
         context.flags |= self.flags
         context.width = self.width
         context.height = self.height
         context.pix_fmt = self.pix_fmt
+        if thread_count:
+            context.thread_count = thread_count
+        if thread_type is not None:
+            context.thread_type = thread_type
         return context
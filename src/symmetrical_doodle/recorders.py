@@ -0,0 +1,177 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import fractions
+from typing import Optional, cast
+
+import av
+import av.container
+import av.video.stream
+
+import symmetrical_doodle.options
+import symmetrical_doodle.packet_queues
+import symmetrical_doodle.packets
+
+DEFAULT_MAXSIZE = 64
+
+# the packet pts are in microseconds
+TIME_BASE = fractions.Fraction(1, 1000000)
+# the duration of a last packet which has no previous one, a 60 fps frame
+DEFAULT_DURATION = 1000000 // 60
+
+
+def get_format_name(record_format: symmetrical_doodle.options.RecordFormat):
+    if record_format == symmetrical_doodle.options.RecordFormat.MP4:
+        return "mp4"
+    elif record_format == symmetrical_doodle.options.RecordFormat.MKV:
+        return "matroska"
+    else:
+        raise RuntimeError
+
+
+@dataclasses.dataclass
+class Recorder:
+    """A demuxer sink which remuxes the packets into a file, without decoding.
+
+    The file is written by a worker thread. The packets wait in a bounded
+    queue which drops them until the next key frame when the disk is too
+    slow, so that the demuxer and the other sinks are never stalled.
+    """
+
+    filename: str
+    format: symmetrical_doodle.options.RecordFormat
+    maxsize: int = DEFAULT_MAXSIZE
+
+    packet_queue: symmetrical_doodle.packet_queues.PacketQueue = dataclasses.field(
+        init=False
+    )
+    executor: concurrent.futures.ThreadPoolExecutor = dataclasses.field(init=False)
+
+    container: Optional[av.container.OutputContainer] = dataclasses.field(
+        default=None, init=False
+    )
+    stream: Optional[av.video.stream.VideoStream] = dataclasses.field(
+        default=None, init=False
+    )
+    config: Optional[bytes] = dataclasses.field(default=None, init=False)
+    """the last config packet, not written yet"""
+    previous: Optional[av.Packet] = dataclasses.field(default=None, init=False)
+    """the last packet, waiting for the next one to know its duration"""
+    duration: int = dataclasses.field(default=DEFAULT_DURATION, init=False)
+    """the duration of the previous packet, given to the last one"""
+
+    def __post_init__(self):
+        self.packet_queue = symmetrical_doodle.packet_queues.PacketQueue(
+            self.maxsize, symmetrical_doodle.packet_queues.OverflowPolicy.DROP_NON_KEY
+        )
+        # a single worker keeps the packets in order
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="recorder"
+        )
+
+    async def put(self, item: symmetrical_doodle.packet_queues.Item):
+        self.packet_queue.put_nowait(item)
+
+    def open(self, context: symmetrical_doodle.packets.VideoCodecContext):
+        assert self.container is None
+        container = av.open(self.filename, "w", format=get_format_name(self.format))
+        # no codec context is created, the packets are muxed as they are
+        stream = container.add_mux_stream(
+            context.codec.name, width=context.width, height=context.height
+        )
+        assert isinstance(stream, av.video.stream.VideoStream)
+        stream.time_base = TIME_BASE
+        self.container = container
+        self.stream = stream
+
+    def write(self, packet: symmetrical_doodle.packets.Packet):
+        is_config = packet.pts is None
+        if is_config:
+            self.config = bytes(packet.input)
+            return
+
+        if self.stream is None or (self.previous is None and self.config is None):
+            # nothing can be decoded before the first config
+            return
+
+        data = packet.input
+        config = self.config
+        if config is not None:
+            # the muxers create the extradata (avcC, hvcC, av1C) from the
+            # config in front of the first packet; H.264 and H.265 packets
+            # already have it merged by the demuxer
+            if bytes(data[: len(config)]) != config:
+                data = b"".join((config, data))
+            self.config = None
+
+        # a copy, the av.Packet of the demuxer may be shared with a decoder;
+        # av.Packet copies from any buffer, its stub only says bytes
+        av_packet = av.Packet(cast(bytes, data))
+        av_packet.pts = packet.pts
+        av_packet.dts = packet.dts
+        av_packet.time_base = TIME_BASE
+        av_packet.is_keyframe = (
+            packet.flags & symmetrical_doodle.packets.AV_PKT_FLAG_KEY != 0
+        )
+        av_packet.stream = self.stream
+
+        previous = self.previous
+        if previous is not None:
+            assert previous.pts is not None
+            self.duration = packet.pts - previous.pts
+            previous.duration = self.duration
+            self.mux(previous)
+        self.previous = av_packet
+
+    def mux(self, av_packet: av.Packet):
+        assert self.container is not None
+        self.container.mux(av_packet)
+
+    def close(self):
+        previous = self.previous
+        if previous is not None:
+            # the duration of the last packet is unknown, the MP4 muxer drops
+            # it without one; the previous frame interval is the best guess
+            previous.duration = self.duration
+            self.mux(previous)
+            self.previous = None
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+    def write_all(self, items: list[symmetrical_doodle.packet_queues.Item]):
+        """Returns False once the end of the stream is reached."""
+        for item in items:
+            if isinstance(item, symmetrical_doodle.packets.VideoCodecContext):
+                self.open(item)
+            elif isinstance(item, symmetrical_doodle.packets.EndOfStream):
+                return False
+            else:
+                self.write(item)
+        return True
+
+    async def get_items(self):
+        """Waits for items, then takes all the items already queued."""
+        items = [await self.packet_queue.get()]
+        while not self.packet_queue.empty():
+            items.append(self.packet_queue.get_nowait())
+        return items
+
+    async def run(self):
+        """Writes the file until the end of the stream."""
+        loop = asyncio.get_running_loop()
+        future: Optional[asyncio.Future[bool]] = None
+        try:
+            while True:
+                items = await self.get_items()
+                future = loop.run_in_executor(self.executor, self.write_all, items)
+                # a cancellation must not interrupt the worker in the middle
+                # of a write
+                if not await asyncio.shield(future):
+                    return
+        finally:
+            if future is not None:
+                await asyncio.wait([future])
+            # the file is finalized on the worker too, even if cancelled
+            await loop.run_in_executor(self.executor, self.close)
+            self.executor.shutdown(wait=False)
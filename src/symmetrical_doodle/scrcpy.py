@@ -1,11 +1,12 @@
 import asyncio
 import asyncio.subprocess
+import concurrent.futures
 import logging
 import pathlib
 import threading
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import symmetrical_doodle.adb
+import symmetrical_doodle.adb.sockets
 import symmetrical_doodle.adb.utils
 import symmetrical_doodle.adb_tunnel
 import symmetrical_doodle.cli
@@ -13,12 +14,18 @@ import symmetrical_doodle.config
 import symmetrical_doodle.control_message
 import symmetrical_doodle.controllers
 import symmetrical_doodle.coords
-import symmetrical_doodle.decoders
-import symmetrical_doodle.demuxers
 import symmetrical_doodle.options
 import symmetrical_doodle.servers
+import symmetrical_doodle.tracing
 import symmetrical_doodle.utils.common
 
+if TYPE_CHECKING:
+    # imported on first use, through symmetrical_doodle.__getattr__
+    import symmetrical_doodle.decoders
+    import symmetrical_doodle.delay_buffers
+    import symmetrical_doodle.demuxers
+    import symmetrical_doodle.recorders
+
 
 def get_pyside_screens():
     import symmetrical_doodle.screens.pyside_screens
@@ -29,10 +36,15 @@ def get_pyside_screens():
 async def wait_and_cancel_all(event: asyncio.Event):
     await event.wait()
     current_task = asyncio.current_task()
+    tasks: list[asyncio.Task[object]] = []
     for task in asyncio.all_tasks():
         if task == current_task:
             continue
         task.cancel()
+        tasks.append(task)
+    # the finally blocks, such as the one finalizing a recording, must run
+    # before the loop stops
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def scrcpy(
@@ -45,6 +57,13 @@ async def scrcpy(
     select_tcpip: bool = False,
     # for screen
     window_title: Optional[str] = None,
+    display_buffer: int = 0,
+    render_driver: Optional[str] = None,
+    # for recorder
+    record_filename: Optional[str] = None,
+    record_format: symmetrical_doodle.options.RecordFormat = symmetrical_doodle.options.RecordFormat.AUTO,
+    # JSON file of the startup phases, "-" for stdout
+    startup_report: Optional[str] = None,
     # for ServerParams
     crop: Optional[str] = None,
     codec_options: Optional[str] = None,
@@ -69,6 +88,8 @@ async def scrcpy(
     version: str = symmetrical_doodle.config.SCRCPY_VERSION,
     device_socket_name: str = symmetrical_doodle.adb_tunnel.DEVICE_SOCKET_NAME,
 ):
+    tracer = symmetrical_doodle.tracing.Tracer()
+
     if display:
         pyside_screens = get_pyside_screens()
     else:
@@ -98,18 +119,19 @@ async def scrcpy(
         version=version,
     )
 
-    adb = symmetrical_doodle.adb.ADB()
-    await symmetrical_doodle.adb.utils.prepare_adb(
-        adb,
-        serial=serial,
-        tcpip_dst=tcpip_dst,
-        select_usb=select_usb,
-        select_tcpip=select_tcpip,
-    )
+    adb = symmetrical_doodle.adb.sockets.SocketADB()
+    with tracer.span("prepare_adb"):
+        await symmetrical_doodle.adb.utils.prepare_adb(
+            adb,
+            serial=serial,
+            tcpip_dst=tcpip_dst,
+            select_usb=select_usb,
+            select_tcpip=select_tcpip,
+        )
 
     tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, device_socket_name)
 
-    server = symmetrical_doodle.servers.Server(params, adb, tunnel)
+    server = symmetrical_doodle.servers.Server(params, adb, tunnel, tracer)
 
     loop = asyncio.new_event_loop()
 
@@ -138,16 +160,26 @@ async def scrcpy(
 
     video_connection = server.video_connection
     assert video_connection is not None
-    demuxer = symmetrical_doodle.demuxers.Demuxer(video_connection)
+    demuxer = symmetrical_doodle.demuxers.Demuxer(video_connection, tracer)
 
-    decoder = symmetrical_doodle.decoders.Decoder()
+    # only decode if something needs the frames
+    if display:
+        decoder = symmetrical_doodle.decoders.Decoder(tracer=tracer)
 
-    decoder_coro = decoder.run()
-    demuxer.sinks.append(decoder.packet_sink)
+        decoder_coro = decoder.run()
+        demuxer.sinks.append(decoder.packet_sink)
+        coros.append(decoder_coro)
+    else:
+        decoder = None
 
     demuxer_coro = demuxer.run()
 
-    coros.extend([decoder_coro, demuxer_coro])
+    recorder_future: Optional[concurrent.futures.Future[None]] = None
+    if record_filename is not None:
+        # the compressed packets are remuxed, not decoded
+        recorder = symmetrical_doodle.recorders.Recorder(record_filename, record_format)
+        demuxer.sinks.append(recorder)
+        recorder_future = asyncio.run_coroutine_threadsafe(recorder.run(), loop)
 
     if display:
         assert pyside_screens is not None
@@ -161,18 +193,41 @@ async def scrcpy(
             except UnicodeDecodeError:
                 pass
 
-        app = pyside_screens.App(thread, window_title=window_title)
-
-        decoder.sinks.append(app.screen.frame_receiver.frame_sink)
+        # "opengl" renders the yuv planes with a shader instead of converting
+        # them to RGB on the CPU
+        app = pyside_screens.App(
+            thread, window_title=window_title, opengl=render_driver == "opengl"
+        )
+
+        assert decoder is not None
+        if display_buffer:
+            # explicit jitter buffer in front of the screen frame buffer
+            delay_buffer = symmetrical_doodle.delay_buffers.DelayBuffer(display_buffer)
+            delay_buffer.sinks.append(app.screen.frame_receiver.frame_sink)
+            decoder.sinks.append(delay_buffer)
+            coros.append(delay_buffer.run())
+        else:
+            decoder.sinks.append(app.screen.frame_receiver.frame_sink)
         screen_frame_receiver_coro = app.screen.frame_receiver.run()
         coros.append(screen_frame_receiver_coro)
 
         futures = [asyncio.run_coroutine_threadsafe(coro, loop) for coro in coros]
+        demuxer_future = asyncio.run_coroutine_threadsafe(demuxer_coro, loop)
 
         r = app.run()
     else:
 
         futures = [asyncio.run_coroutine_threadsafe(coro, loop) for coro in coros]
+        demuxer_future = asyncio.run_coroutine_threadsafe(demuxer_coro, loop)
+
+        # nothing is shown, run until the stream ends
+        try:
+            demuxer_future.result()
+            if recorder_future is not None:
+                # the file is finalized after the end of the stream
+                recorder_future.result()
+        except KeyboardInterrupt:
+            pass
 
     # cancel all tasks
     event = asyncio.Event()
@@ -190,6 +245,17 @@ async def scrcpy(
     else:
         thread.wait()
 
+    if startup_report is not None:
+        write_startup_report(tracer, startup_report)
+
+
+def write_startup_report(tracer: symmetrical_doodle.tracing.Tracer, filename: str):
+    report = tracer.dumps()
+    if filename == "-":
+        print(report)
+    else:
+        pathlib.Path(filename).write_text(report + "\n")
+
 
 def clean_up(
     loop: asyncio.AbstractEventLoop, server: symmetrical_doodle.servers.Server
@@ -216,6 +282,11 @@ async def main():
         select_tcpip=options.select_tcpip,
         #
         window_title=options.window_title,
+        display_buffer=options.display_buffer,
+        render_driver=options.render_driver,
+        record_filename=options.record_filename,
+        record_format=options.record_format,
+        startup_report=options.startup_report,
         #
         crop=options.crop,
         codec_options=options.codec_options,
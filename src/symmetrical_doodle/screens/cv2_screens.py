@@ -1,25 +1,34 @@
-import asyncio
 import dataclasses
 
 import av
 import cv2
 
+import symmetrical_doodle.converters
+import symmetrical_doodle.frame_buffers
+
 
 @dataclasses.dataclass
 class CV2Screen:
-    frame_sink: asyncio.Queue[av.VideoFrame] = dataclasses.field(
-        default_factory=asyncio.Queue, init=False
+    frame_sink: symmetrical_doodle.frame_buffers.FrameBuffer[av.VideoFrame] = (
+        dataclasses.field(
+            default_factory=symmetrical_doodle.frame_buffers.FrameBuffer, init=False
+        )
     )
 
     winname: str
     title: str = ""
 
+    converter: symmetrical_doodle.converters.FrameConverter = dataclasses.field(
+        default_factory=lambda: symmetrical_doodle.converters.FrameConverter("bgr24"),
+        init=False,
+    )
+
     async def run(self):
         cv2.namedWindow(self.winname, cv2.WINDOW_GUI_NORMAL)
 
         while True:
             frame = await self.frame_sink.get()
-            frame = frame.to_ndarray(format="bgr24")
+            frame = await self.converter.convert(frame)
             cv2.resizeWindow(self.winname, frame.shape[1] // 3, frame.shape[0] // 3)
             cv2.imshow(self.winname, frame)
             key = cv2.pollKey()
@@ -1,5 +1,6 @@
 import asyncio
 import dataclasses
+import struct
 from collections.abc import Callable
 from typing import Optional
 
@@ -7,25 +8,65 @@ import av
 import numpy
 import PySide6.QtCore
 import PySide6.QtGui
+import PySide6.QtOpenGL
+import PySide6.QtOpenGLWidgets
 import PySide6.QtWidgets
 
+import symmetrical_doodle.converters
+import symmetrical_doodle.frame_buffers
+
 
 @dataclasses.dataclass
 class FrameReceiver:
     signal_instance: PySide6.QtCore.SignalInstance
-    frame_sink: asyncio.Queue[av.VideoFrame] = dataclasses.field(
-        default_factory=asyncio.Queue, init=False
+    frame_sink: symmetrical_doodle.frame_buffers.FrameBuffer[av.VideoFrame] = (
+        dataclasses.field(
+            default_factory=symmetrical_doodle.frame_buffers.FrameBuffer, init=False
+        )
+    )
+
+    converter: Optional[symmetrical_doodle.converters.FrameConverter] = (
+        dataclasses.field(default_factory=symmetrical_doodle.converters.FrameConverter)
     )
+    """if None, frames are emitted as yuv420p av.VideoFrame"""
+
+    ready: asyncio.Event = dataclasses.field(default_factory=asyncio.Event, init=False)
+    """cleared while an emitted frame has not been presented"""
+    loop: Optional[asyncio.AbstractEventLoop] = dataclasses.field(
+        default=None, init=False
+    )
+
+    def presented(self):
+        """Allows the next frame to be emitted, may be called from any thread."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.ready.set)
 
     async def run(self):
-        while True:
-            frame = await self.frame_sink.get()
-            image = frame.to_ndarray(format="rgb24")
-            self.signal_instance.emit(image)
+        self.loop = asyncio.get_running_loop()
+        self.ready.set()
+        try:
+            while True:
+                # at most one frame is queued in the GUI thread, the newer
+                # frames replace each other in the frame sink meanwhile
+                await self.ready.wait()
+                frame = await self.frame_sink.get()
+                if self.converter is None:
+                    if frame.format.name not in YUVWidget.FORMATS:
+                        frame = frame.reformat(format="yuv420p")
+                    self.ready.clear()
+                    self.signal_instance.emit(frame)
+                else:
+                    image = await self.converter.convert(frame)
+                    self.ready.clear()
+                    self.signal_instance.emit(image)
+        finally:
+            if self.converter is not None:
+                self.converter.close()
 
 
 class Thread(PySide6.QtCore.QThread):
     image_received = PySide6.QtCore.Signal(numpy.ndarray)
+    frame_received = PySide6.QtCore.Signal(object)
 
     def __init__(self, target: Callable[[], None]):
         super().__init__()
@@ -35,6 +76,190 @@ class Thread(PySide6.QtCore.QThread):
         self.target()
 
 
+VERTEX_SHADER = """
+attribute vec2 position;
+varying vec2 texture_coordinate;
+
+void main() {
+    gl_Position = vec4(position, 0.0, 1.0);
+    texture_coordinate = vec2(position.x + 1.0, 1.0 - position.y) * 0.5;
+}
+"""
+
+FRAGMENT_SHADER = """
+#ifdef GL_ES
+precision mediump float;
+#endif
+varying vec2 texture_coordinate;
+uniform sampler2D y_texture;
+uniform sampler2D u_texture;
+uniform sampler2D v_texture;
+uniform mat3 matrix;
+uniform vec3 offset;
+
+void main() {
+    vec3 yuv = vec3(
+        texture2D(y_texture, texture_coordinate).r,
+        texture2D(u_texture, texture_coordinate).r,
+        texture2D(v_texture, texture_coordinate).r
+    );
+    gl_FragColor = vec4(matrix * (yuv - offset), 1.0);
+}
+"""
+
+GL_COLOR_BUFFER_BIT = 0x00004000
+GL_FLOAT = 0x1406
+GL_TRIANGLE_STRIP = 0x0005
+
+# a full viewport quad
+QUAD = struct.pack("8f", -1, -1, 1, -1, -1, 1, 1, 1)
+
+
+class YUVWidget(PySide6.QtOpenGLWidgets.QOpenGLWidget):
+    """Renders yuv420p frames, converting them to RGB in a fragment shader.
+
+    The planes are uploaded as-is into three single-channel textures, so no
+    RGB image is ever produced on the CPU.
+    """
+
+    FORMATS = ("yuv420p", "yuvj420p")
+
+    def __init__(self, parent: Optional[PySide6.QtWidgets.QWidget] = None):
+        super().__init__(parent)
+        self.frame: Optional[av.VideoFrame] = None
+        self.program: Optional[PySide6.QtOpenGL.QOpenGLShaderProgram] = None
+        self.vao: Optional[PySide6.QtOpenGL.QOpenGLVertexArrayObject] = None
+        self.vbo: Optional[PySide6.QtOpenGL.QOpenGLBuffer] = None
+        self.textures: list[PySide6.QtOpenGL.QOpenGLTexture] = []
+        self.matrix = PySide6.QtGui.QMatrix3x3()
+        self.offset = PySide6.QtGui.QVector3D()
+
+    def set_frame(self, frame: av.VideoFrame):
+        self.frame = frame
+        self.update()
+
+    def initializeGL(self):
+        program = PySide6.QtOpenGL.QOpenGLShaderProgram(self)
+        assert program.addShaderFromSourceCode(
+            PySide6.QtOpenGL.QOpenGLShader.ShaderTypeBit.Vertex, VERTEX_SHADER
+        ), program.log()
+        assert program.addShaderFromSourceCode(
+            PySide6.QtOpenGL.QOpenGLShader.ShaderTypeBit.Fragment, FRAGMENT_SHADER
+        ), program.log()
+        program.bindAttributeLocation("position", 0)
+        assert program.link(), program.log()
+        self.program = program
+
+        self.vao = PySide6.QtOpenGL.QOpenGLVertexArrayObject(self)
+        self.vao.create()
+        self.vao.bind()
+        self.vbo = PySide6.QtOpenGL.QOpenGLBuffer()
+        self.vbo.create()
+        self.vbo.bind()
+        self.vbo.allocate(QUAD, len(QUAD))
+        program.enableAttributeArray(0)
+        program.setAttributeBuffer(0, GL_FLOAT, 0, 2)
+        self.vbo.release()
+        self.vao.release()
+
+        self.context().aboutToBeDestroyed.connect(self.cleanup)
+
+    def cleanup(self):
+        self.makeCurrent()
+        for texture in self.textures:
+            texture.destroy()
+        self.textures = []
+        if self.vbo is not None:
+            self.vbo.destroy()
+            self.vbo = None
+        if self.vao is not None:
+            self.vao.destroy()
+            self.vao = None
+        self.program = None
+        self.doneCurrent()
+
+    def get_textures(self, frame: av.VideoFrame):
+        sizes = [(plane.width, plane.height) for plane in frame.planes]
+        if [(texture.width(), texture.height()) for texture in self.textures] == sizes:
+            return self.textures
+
+        # the frame size changed, for example after a rotation
+        for texture in self.textures:
+            texture.destroy()
+        self.textures = []
+        for width, height in sizes:
+            texture = PySide6.QtOpenGL.QOpenGLTexture(
+                PySide6.QtOpenGL.QOpenGLTexture.Target.Target2D
+            )
+            texture.setFormat(PySide6.QtOpenGL.QOpenGLTexture.TextureFormat.R8_UNorm)
+            texture.setSize(width, height)
+            texture.setMinMagFilters(
+                PySide6.QtOpenGL.QOpenGLTexture.Filter.Linear,
+                PySide6.QtOpenGL.QOpenGLTexture.Filter.Linear,
+            )
+            texture.setWrapMode(PySide6.QtOpenGL.QOpenGLTexture.WrapMode.ClampToEdge)
+            texture.allocateStorage(
+                PySide6.QtOpenGL.QOpenGLTexture.PixelFormat.Red,
+                PySide6.QtOpenGL.QOpenGLTexture.PixelType.UInt8,
+            )
+            self.textures.append(texture)
+        return self.textures
+
+    def upload(self, frame: av.VideoFrame):
+        textures = self.get_textures(frame)
+        options = PySide6.QtOpenGL.QOpenGLPixelTransferOptions()
+        options.setAlignment(1)
+        for texture, plane in zip(textures, frame.planes):
+            # the rows are padded to line_size bytes, let the driver skip it
+            options.setRowLength(plane.line_size)
+            texture.setData(
+                PySide6.QtOpenGL.QOpenGLTexture.PixelFormat.Red,
+                PySide6.QtOpenGL.QOpenGLTexture.PixelType.UInt8,
+                plane.buffer_ptr,
+                options,
+            )
+
+    def paintGL(self):
+        functions = self.context().functions()
+        functions.glClearColor(0, 0, 0, 1)
+        functions.glClear(GL_COLOR_BUFFER_BIT)
+
+        if self.program is None or self.vao is None:
+            return
+
+        frame = self.frame
+        if frame is not None:
+            # the data is copied by the driver, the frame can be released
+            self.frame = None
+            self.upload(frame)
+            color_range = frame.color_range
+            if frame.format.name == "yuvj420p":
+                color_range = symmetrical_doodle.converters.AVCOL_RANGE_JPEG
+            matrix, offset = symmetrical_doodle.converters.get_yuv_to_rgb_matrix(
+                frame.colorspace, color_range, frame.height
+            )
+            self.matrix = PySide6.QtGui.QMatrix3x3(
+                [value for row in matrix for value in row]
+            )
+            self.offset = PySide6.QtGui.QVector3D(*offset)
+
+        if not self.textures:
+            return
+
+        self.program.bind()
+        for unit, (texture, name) in enumerate(
+            zip(self.textures, (b"y_texture", b"u_texture", b"v_texture"))
+        ):
+            texture.bind(unit)
+            self.program.setUniformValue1i(name, unit)
+        self.program.setUniformValue(b"matrix", self.matrix)
+        self.program.setUniformValue(b"offset", self.offset)
+        self.vao.bind()
+        functions.glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+        self.vao.release()
+        self.program.release()
+
+
 class PySideScreen(PySide6.QtWidgets.QWidget):
 
     def __init__(
@@ -42,26 +267,38 @@ class PySideScreen(PySide6.QtWidgets.QWidget):
         thread: Thread,
         size: Optional[tuple[int, int]] = None,
         window_title: Optional[str] = None,
+        opengl: bool = False,
     ):
 
         super().__init__()
 
-        self.pixmap = PySide6.QtGui.QPixmap()
-        self.label = PySide6.QtWidgets.QLabel()
+        layout = PySide6.QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
 
-        self.frame_receiver = FrameReceiver(thread.image_received)
+        if opengl:
+            # the decoded planes go straight to the GPU
+            self.yuv_widget = YUVWidget()
+            self.frame_receiver = FrameReceiver(thread.frame_received, converter=None)
+            layout.addWidget(self.yuv_widget)
+            thread.frame_received.connect(self.update_frame)
+            # paced by the buffer swaps, which are synchronized to the vsync
+            self.yuv_widget.frameSwapped.connect(self.frame_receiver.presented)
+        else:
+            self.pixmap = PySide6.QtGui.QPixmap()
+            self.label = PySide6.QtWidgets.QLabel()
 
-        self.label.setPixmap(self.pixmap)
-        self.label.setScaledContents(True)
+            self.frame_receiver = FrameReceiver(thread.image_received)
 
-        layout = PySide6.QtWidgets.QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(self.label)
-        self.setLayout(layout)
+            self.label.setPixmap(self.pixmap)
+            self.label.setScaledContents(True)
 
-        thread.image_received.connect(self.update_image)
+            layout.addWidget(self.label)
+            thread.image_received.connect(self.update_image)
+
+        self.setLayout(layout)
 
         self.device_screen_size = size
+        self.frame_size: Optional[tuple[int, int]] = None
 
         if window_title is not None:
             self.setWindowTitle(window_title)
@@ -71,13 +308,38 @@ class PySideScreen(PySide6.QtWidgets.QWidget):
         self, image: numpy.ndarray[tuple[int, int, int], numpy.dtype[numpy.uint8]]
     ):
         height, width = image.shape[:2]
+        # the rows of the converted images may be padded, QImage needs the
+        # whole lines as a contiguous buffer
+        bytes_per_line = image.strides[0]
+        lines = numpy.lib.stride_tricks.as_strided(
+            image, (height, bytes_per_line), (bytes_per_line, 1)
+        )
 
         self.pixmap.convertFromImage(
             PySide6.QtGui.QImage(
-                image.data, width, height, PySide6.QtGui.QImage.Format.Format_RGB888
+                lines.data,
+                width,
+                height,
+                bytes_per_line,
+                PySide6.QtGui.QImage.Format.Format_RGB888,
             )
         )
         self.label.setPixmap(self.pixmap)
+        # the label repaints are coalesced by Qt
+        self.frame_receiver.presented()
+
+        self.update_size(width, height)
+
+    @PySide6.QtCore.Slot(object)  # type: ignore https://bugreports.qt.io/browse/PYSIDE-2942
+    def update_frame(self, frame: av.VideoFrame):
+        self.yuv_widget.set_frame(frame)
+        self.update_size(frame.width, frame.height)
+
+    def update_size(self, width: int, height: int):
+        # avoid a layout pass per frame, the size only changes on rotation
+        if self.frame_size == (width, height):
+            return
+        self.frame_size = (width, height)
 
         rect = self.screen().availableGeometry()
         if width > rect.width():
@@ -99,13 +361,14 @@ class App:
     thread: Thread
     size: dataclasses.InitVar[Optional[tuple[int, int]]] = None
     window_title: dataclasses.InitVar[Optional[str]] = None
+    opengl: dataclasses.InitVar[bool] = False
     screen: PySideScreen = dataclasses.field(init=False)
     app: PySide6.QtWidgets.QApplication = dataclasses.field(
         default_factory=PySide6.QtWidgets.QApplication
     )
 
-    def __post_init__(self, size, window_title):
-        self.screen = PySideScreen(self.thread, size, window_title)
+    def __post_init__(self, size, window_title, opengl):
+        self.screen = PySideScreen(self.thread, size, window_title, opengl)
 
     def show(self):
         self.screen.show()
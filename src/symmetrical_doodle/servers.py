@@ -3,13 +3,16 @@ import asyncio.subprocess
 import dataclasses
 import logging
 import pathlib
+import sys
 from typing import Optional
 
 import symmetrical_doodle.adb
+import symmetrical_doodle.adb.sockets
 import symmetrical_doodle.adb_tunnel
 import symmetrical_doodle.config
 import symmetrical_doodle.coords
 import symmetrical_doodle.options
+import symmetrical_doodle.tracing
 import symmetrical_doodle.utils.conection
 
 logger = logging.getLogger(__name__)
@@ -18,6 +21,13 @@ DEVICE_SERVER_PATH = "/data/local/tmp/scrcpy-server.jar"
 
 DEVICE_NAME_FIELD_LENGTH = 64
 
+# logged by the server just before it opens its sockets
+READY_LINE = b"INFO: Device: "
+
+CONNECT_TIMEOUT = 10
+CONNECT_INITIAL_DELAY = 0.002
+CONNECT_MAX_DELAY = 0.1
+
 
 def create_server_params(
     server_path: str,
@@ -68,7 +78,7 @@ def create_server_params(
 
 
 def create_default_server(server_path: str):
-    adb = symmetrical_doodle.adb.ADB()
+    adb = symmetrical_doodle.adb.sockets.SocketADB()
     tunnel = symmetrical_doodle.adb_tunnel.Tunnel(
         adb, symmetrical_doodle.adb_tunnel.DEVICE_SOCKET_NAME
     )
@@ -129,7 +139,14 @@ class Server:
 
     tunnel: symmetrical_doodle.adb_tunnel.Tunnel
 
-    process: Optional[asyncio.subprocess.Process] = dataclasses.field(
+    tracer: Optional[symmetrical_doodle.tracing.Tracer] = None
+
+    keep_tunnel: bool = False
+    """keep the tunnel after run(), so that the server can be run again after
+    close() without removing and recreating the adb forward or reverse;
+    close_tunnel() removes it"""
+
+    process: Optional[symmetrical_doodle.adb.Process] = dataclasses.field(
         default=None, init=False
     )
 
@@ -140,6 +157,12 @@ class Server:
         dataclasses.field(default=None, init=False)
     )
 
+    ready: asyncio.Event = dataclasses.field(default_factory=asyncio.Event, init=False)
+    """set when the server output shows that it is about to listen"""
+    output_task: Optional[asyncio.Task[None]] = dataclasses.field(
+        default=None, init=False
+    )
+
     def execute(self):
         command = [
             "shell",
@@ -194,14 +217,22 @@ class Server:
             # By default, cleanup is true
             command.append("cleanup=false")
 
-        return self.adb.run_command(command)
+        # the output is watched for READY_LINE, then forwarded to stdout
+        return self.adb.run_command(command, stdout=asyncio.subprocess.PIPE)
+
+    async def forward_output(self, reader: asyncio.StreamReader):
+        while line := await reader.readline():
+            if READY_LINE in line:
+                self.ready.set()
+            sys.stdout.buffer.write(line)
+            sys.stdout.buffer.flush()
 
     async def connect(self):
         if self.tunnel.forward:
             host = "127.0.0.1"
             port = self.tunnel.local_port
 
-            self.video_connection = await retry_connect(100, 0.1, host, port)
+            self.video_connection = await retry_connect(host, port, self.ready)
             if self.params.control:
                 # we know that the device is listening, we don't need several
                 # attempts
@@ -215,16 +246,42 @@ class Server:
 
     async def run(self):
         """Runs the server and connects to the server."""
-        await self.push()
+        tracer = self.tracer
 
-        async with self.tunnel.open(
-            port=self.params.port, force_forward=self.params.force_adb_forward
-        ):
-            self.process = await self.execute()
-            await self.connect()
+        async def push():
+            with symmetrical_doodle.tracing.span(tracer, "push"):
+                await self.push()
+
+        # set by the output of a previous run
+        self.ready.clear()
+
+        # the jar is pushed while the tunnel is being set up, the tunnel is
+        # entered here so that it is closed whatever fails
+        push_task = asyncio.create_task(push())
+        try:
+            with symmetrical_doodle.tracing.span(tracer, "tunnel"):
+                async with self.tunnel.open(
+                    port=self.params.port,
+                    force_forward=self.params.force_adb_forward,
+                    keep=self.keep_tunnel,
+                ):
+                    await push_task
+                    with symmetrical_doodle.tracing.span(tracer, "execute"):
+                        self.process = await self.execute()
+                    assert self.process.stdout is not None
+                    self.output_task = asyncio.create_task(
+                        self.forward_output(self.process.stdout)
+                    )
+                    with symmetrical_doodle.tracing.span(tracer, "connect"):
+                        await self.connect()
+        finally:
+            # the tunnel may have failed first
+            push_task.cancel()
+            await asyncio.gather(push_task, return_exceptions=True)
 
         assert self.video_connection is not None
-        self.info = await read_device_info(self.video_connection)
+        with symmetrical_doodle.tracing.span(tracer, "read_device_info"):
+            self.info = await read_device_info(self.video_connection)
 
     async def push(self):
         assert self.params.server_path.is_file()
@@ -258,10 +315,38 @@ class Server:
                 logger.warning("Killing the server...")
                 self.process.kill()
 
-
-async def retry_connect(attempts: int, delay: float, host, port):
-    while attempts > 0:
-        logger.debug("Remaining connection attempts: %s", attempts)
+            if self.output_task is not None:
+                try:
+                    await asyncio.wait_for(self.output_task, WATCHDOG_DELAY)
+                except asyncio.TimeoutError:
+                    pass
+                self.output_task = None
+
+    async def close_tunnel(self):
+        """Removes a tunnel kept by run()."""
+        await self.tunnel.close()
+
+
+async def retry_connect(
+    host,
+    port,
+    ready: Optional[asyncio.Event] = None,
+    timeout: float = CONNECT_TIMEOUT,
+    initial_delay: float = CONNECT_INITIAL_DELAY,
+    max_delay: float = CONNECT_MAX_DELAY,
+):
+    """Connects to the server once it listens and sent its dummy byte.
+
+    The delay between the attempts starts small and doubles up to max_delay.
+    If ready is given, an attempt is made as soon as it is set, and the delay
+    starts over.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
         try:
             reader, writer = await asyncio.open_connection(host=host, port=port)
         except ConnectionRefusedError:
@@ -273,9 +358,19 @@ async def retry_connect(attempts: int, delay: float, host, port):
                 writer.close()
                 await writer.wait_closed()
             else:
+                logger.debug("Connected after %s attempts", attempts)
                 return reader, writer
 
-        attempts -= 1
-        if attempts:
-            await asyncio.sleep(delay)
-    raise RuntimeError
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise RuntimeError
+        if ready is not None and not ready.is_set():
+            try:
+                await asyncio.wait_for(ready.wait(), min(delay, remaining))
+            except asyncio.TimeoutError:
+                delay = min(delay * 2, max_delay)
+            else:
+                delay = initial_delay
+        else:
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
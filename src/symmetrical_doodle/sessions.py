@@ -0,0 +1,153 @@
+import asyncio
+import dataclasses
+import logging
+from typing import Optional
+
+import av
+
+import symmetrical_doodle.adb.sockets
+import symmetrical_doodle.adb_tunnel
+import symmetrical_doodle.controllers
+import symmetrical_doodle.decoders
+import symmetrical_doodle.demuxers
+import symmetrical_doodle.packet_queues
+import symmetrical_doodle.servers
+import symmetrical_doodle.sinks
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Session:
+    """A device session, with its own server, tunnel and pipeline.
+
+    The sinks must be added before running. A decoder is only created if there
+    is at least one frame sink.
+    """
+
+    params: symmetrical_doodle.servers.ServerParams
+    serial: str
+    device_socket_name: str = symmetrical_doodle.adb_tunnel.DEVICE_SOCKET_NAME
+
+    packet_sinks: list[
+        symmetrical_doodle.sinks.Sink[symmetrical_doodle.packet_queues.Item]
+    ] = dataclasses.field(default_factory=list, init=False)
+    frame_sinks: list[symmetrical_doodle.sinks.Sink[av.VideoFrame]] = dataclasses.field(
+        default_factory=list, init=False
+    )
+
+    server: Optional[symmetrical_doodle.servers.Server] = dataclasses.field(
+        default=None, init=False
+    )
+    demuxer: Optional[symmetrical_doodle.demuxers.Demuxer] = dataclasses.field(
+        default=None, init=False
+    )
+    decoder: Optional[symmetrical_doodle.decoders.Decoder] = dataclasses.field(
+        default=None, init=False
+    )
+    controller: Optional[symmetrical_doodle.controllers.Controller] = dataclasses.field(
+        default=None, init=False
+    )
+
+    started: asyncio.Event = dataclasses.field(
+        default_factory=asyncio.Event, init=False
+    )
+    exception: Optional[BaseException] = dataclasses.field(default=None, init=False)
+
+    def create_server(self):
+        adb = symmetrical_doodle.adb.sockets.SocketADB()
+        adb.serial = self.serial
+        tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, self.device_socket_name)
+        return symmetrical_doodle.servers.Server(self.params, adb, tunnel)
+
+    async def start(self):
+        """Starts the server and connects to it."""
+        self.server = self.create_server()
+        await self.server.run()
+
+        video_connection = self.server.video_connection
+        assert video_connection is not None
+        self.demuxer = symmetrical_doodle.demuxers.Demuxer(video_connection)
+        self.demuxer.sinks.extend(self.packet_sinks)
+
+        if self.frame_sinks:
+            self.decoder = symmetrical_doodle.decoders.Decoder()
+            self.decoder.sinks.extend(self.frame_sinks)
+            self.demuxer.sinks.append(self.decoder.packet_sink)
+
+        control_connection = self.server.control_connection
+        if control_connection is not None:
+            self.controller = symmetrical_doodle.controllers.Controller(
+                control_connection
+            )
+
+        self.started.set()
+
+    async def run(self):
+        """Runs the session until the video stream ends."""
+        await self.start()
+        assert self.demuxer is not None
+
+        controller_task = None
+        if self.controller is not None:
+            controller_task = asyncio.create_task(self.controller.run())
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(self.demuxer.run())
+                if self.decoder is not None:
+                    task_group.create_task(self.decoder.run())
+        finally:
+            if controller_task is not None:
+                controller_task.cancel()
+
+    async def close(self):
+        if self.server is not None:
+            await self.server.close()
+
+
+@dataclasses.dataclass
+class SessionManager:
+    """Runs many sessions concurrently on the same event loop.
+
+    The sessions start in parallel, and a failing session does not affect the
+    others: its exception is logged and kept in Session.exception.
+    """
+
+    sessions: list[Session] = dataclasses.field(default_factory=list)
+    adb: Optional[symmetrical_doodle.adb.sockets.SocketADB] = None
+
+    def add(self, session: Session):
+        self.sessions.append(session)
+        return session
+
+    async def run_session(self, session: Session):
+        try:
+            await session.run()
+        except Exception as e:
+            logger.exception("Session %s failed", session.serial)
+            session.exception = e
+        finally:
+            try:
+                await session.close()
+            except Exception:
+                logger.exception("Could not close session %s", session.serial)
+
+    async def run_sessions(self):
+        await asyncio.gather(*(self.run_session(session) for session in self.sessions))
+
+    def get_adb(self):
+        if self.adb is None:
+            self.adb = symmetrical_doodle.adb.sockets.SocketADB()
+        return self.adb
+
+    async def start_server(self):
+        # once for all the sessions, instead of once per device
+        process = await self.get_adb().start_server()
+        assert not await process.wait()
+
+    async def run(self):
+        await self.start_server()
+        await self.run_sessions()
+
+    def failed(self):
+        return [session for session in self.sessions if session.exception is not None]
@@ -0,0 +1,292 @@
+import asyncio
+import dataclasses
+import enum
+import logging
+import multiprocessing
+import multiprocessing.context
+import multiprocessing.queues
+import os
+import queue
+from typing import Optional
+
+import symmetrical_doodle.control_message
+import symmetrical_doodle.servers
+import symmetrical_doodle.sessions
+import symmetrical_doodle.shared_frames
+
+logger = logging.getLogger(__name__)
+
+# bytes per slot, enough for a 1440x3200 rgb24 frame, the frames of a larger
+# screen need max_size or a larger frame_capacity
+DEFAULT_FRAME_CAPACITY = 1440 * 3200 * 3
+
+JOIN_TIMEOUT = 5
+
+
+class Status(enum.Enum):
+    STARTING = 0
+    RUNNING = enum.auto()
+    FAILED = enum.auto()
+    ENDED = enum.auto()
+
+
+@dataclasses.dataclass
+class StatusUpdate:
+    serial: str
+    status: Status
+    detail: str = ""
+
+
+@dataclasses.dataclass
+class Command:
+    serial: str
+    message: symmetrical_doodle.control_message.ControlMessage
+
+
+def split(serials: list[str], count: int):
+    """Distributes the serials over at most count shards."""
+    shards = [serials[i::count] for i in range(count)]
+    return [shard for shard in shards if shard]
+
+
+def get_frame_capacity(params: symmetrical_doodle.servers.ServerParams):
+    if params.max_size:
+        return params.max_size * params.max_size * 3
+    return DEFAULT_FRAME_CAPACITY
+
+
+@dataclasses.dataclass
+class Shard:
+    """Runs the sessions of a worker process.
+
+    The frames are decoded and converted in the worker, and written into the
+    shared frame rings created by the coordinator.
+    """
+
+    params: symmetrical_doodle.servers.ServerParams
+    frame_names: dict[str, str]
+    """the shared frame name of each serial"""
+    commands: multiprocessing.queues.Queue
+    statuses: multiprocessing.queues.Queue
+
+    manager: symmetrical_doodle.sessions.SessionManager = dataclasses.field(
+        default_factory=symmetrical_doodle.sessions.SessionManager, init=False
+    )
+    rejected: int = dataclasses.field(default=0, init=False)
+    """the number of commands rejected by a full control queue"""
+
+    async def run_session(
+        self,
+        session: symmetrical_doodle.sessions.Session,
+        writer: symmetrical_doodle.shared_frames.SharedFrameWriter,
+    ):
+        self.statuses.put(StatusUpdate(session.serial, Status.STARTING))
+
+        async def report_started():
+            await session.started.wait()
+            self.statuses.put(StatusUpdate(session.serial, Status.RUNNING))
+
+        reporter = asyncio.create_task(report_started())
+        writer_task = asyncio.create_task(writer.run())
+        session_task = asyncio.create_task(self.manager.run_session(session))
+        try:
+            await asyncio.wait(
+                [session_task, writer_task], return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            # a writer failure, like a frame larger than a slot, also stops
+            # the session
+            for task in (session_task, reporter, writer_task):
+                task.cancel()
+            await asyncio.gather(
+                session_task, reporter, writer_task, return_exceptions=True
+            )
+            writer.close()
+            writer.ring.close()
+
+        exception = session.exception
+        if exception is None and not writer_task.cancelled():
+            exception = writer_task.exception()
+            if exception is not None:
+                logger.error(
+                    "Frame writer of %s failed", session.serial, exc_info=exception
+                )
+        if exception is not None:
+            self.statuses.put(
+                StatusUpdate(session.serial, Status.FAILED, repr(exception))
+            )
+        else:
+            self.statuses.put(StatusUpdate(session.serial, Status.ENDED))
+
+    async def receive_commands(self):
+        sessions = {session.serial: session for session in self.manager.sessions}
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await loop.run_in_executor(None, self.commands.get)
+            if command is None:
+                # stop
+                return
+            controller = sessions[command.serial].controller
+            if controller is None:
+                logger.warning("Session %s has no controller", command.serial)
+                continue
+            try:
+                controller.post(command.message)
+            except asyncio.QueueFull:
+                # waiting for this device would hold the commands of the
+                # others
+                self.rejected += 1
+                logger.warning(
+                    "Control queue of %s is full, command dropped", command.serial
+                )
+
+    async def run(self):
+        try:
+            await self.manager.start_server()
+        except Exception as e:
+            logger.exception("Could not start the adb server")
+            for serial in self.frame_names:
+                self.statuses.put(StatusUpdate(serial, Status.FAILED, repr(e)))
+            return
+
+        coros = []
+        for serial, name in self.frame_names.items():
+            session = self.manager.add(
+                symmetrical_doodle.sessions.Session(self.params, serial)
+            )
+            writer = symmetrical_doodle.shared_frames.SharedFrameWriter(
+                symmetrical_doodle.shared_frames.SharedFrameRing.attach(name)
+            )
+            session.frame_sinks.append(writer)
+            coros.append(self.run_session(session, writer))
+
+        sessions = asyncio.ensure_future(asyncio.gather(*coros))
+        receiver = asyncio.create_task(self.receive_commands())
+        done, _ = await asyncio.wait(
+            [sessions, receiver], return_when=asyncio.FIRST_COMPLETED
+        )
+        if receiver in done:
+            # stopped by the coordinator
+            sessions.cancel()
+        else:
+            # unblock the receiver
+            self.commands.put(None)
+        try:
+            await sessions
+        except asyncio.CancelledError:
+            pass
+        await receiver
+
+
+def run_shard(
+    params: symmetrical_doodle.servers.ServerParams,
+    frame_names: dict[str, str],
+    commands: multiprocessing.queues.Queue,
+    statuses: multiprocessing.queues.Queue,
+):
+    """The entry point of the worker processes."""
+    asyncio.run(Shard(params, frame_names, commands, statuses).run())
+
+
+@dataclasses.dataclass
+class Coordinator:
+    """Shards device sessions over worker processes.
+
+    Control messages are routed to the worker running the device, the status
+    updates of all the workers are aggregated, and the frames are read from
+    shared memory instead of being pickled.
+    """
+
+    params: symmetrical_doodle.servers.ServerParams
+    serials: list[str]
+    processes: int = dataclasses.field(default_factory=lambda: os.cpu_count() or 1)
+    frame_capacity: Optional[int] = None
+    """the bytes of a frame slot, from the max size of the params by default"""
+
+    context: multiprocessing.context.SpawnContext = dataclasses.field(
+        default_factory=lambda: multiprocessing.get_context("spawn"), init=False
+    )
+    workers: list[multiprocessing.context.SpawnProcess] = dataclasses.field(
+        default_factory=list, init=False
+    )
+    commands: dict[str, multiprocessing.queues.Queue] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+    status_queue: Optional[multiprocessing.queues.Queue] = dataclasses.field(
+        default=None, init=False
+    )
+    statuses: dict[str, StatusUpdate] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+    rings: dict[str, symmetrical_doodle.shared_frames.SharedFrameRing] = (
+        dataclasses.field(default_factory=dict, init=False)
+    )
+
+    def start(self):
+        capacity = self.frame_capacity
+        if capacity is None:
+            capacity = get_frame_capacity(self.params)
+        status_queue = self.context.Queue()
+        self.status_queue = status_queue
+        for serials in split(self.serials, self.processes):
+            commands = self.context.Queue()
+            frame_names = {}
+            for serial in serials:
+                ring = symmetrical_doodle.shared_frames.SharedFrameRing.create(capacity)
+                self.rings[serial] = ring
+                frame_names[serial] = ring.name
+                self.commands[serial] = commands
+            worker = self.context.Process(
+                target=run_shard,
+                args=(self.params, frame_names, commands, status_queue),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def send(
+        self, serial: str, message: symmetrical_doodle.control_message.ControlMessage
+    ):
+        self.commands[serial].put(Command(serial, message))
+
+    def poll(self):
+        """Returns the status updates received since the last call."""
+        assert self.status_queue is not None
+        updates: list[StatusUpdate] = []
+        while True:
+            try:
+                update = self.status_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.statuses[update.serial] = update
+            updates.append(update)
+        return updates
+
+    def read_frame(self, serial: str):
+        """Returns a copy of the last rgb24 image of a device, if any."""
+        return self.rings[serial].read()
+
+    def latest_frame(self, serial: str):
+        """Returns a zero-copy view of the last frame of a device, if any.
+
+        The view must not be used after close().
+        """
+        return self.rings[serial].latest()
+
+    def close(self):
+        for commands in set(self.commands.values()):
+            commands.put(None)
+        for worker in self.workers:
+            worker.join(JOIN_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.workers = []
+        for serial, ring in self.rings.items():
+            try:
+                ring.close()
+            except BufferError:
+                # the memory is unmapped once the views are garbage collected
+                logger.warning("Frame views of %s are still in use", serial)
+            ring.unlink()
+        self.rings = {}
@@ -0,0 +1,254 @@
+import dataclasses
+import multiprocessing.shared_memory
+import struct
+from typing import Optional
+
+import av
+import numpy
+
+import symmetrical_doodle.converters
+import symmetrical_doodle.frame_buffers
+
+# slot count, slot capacity, latest sequence number
+RING_HEADER = struct.Struct("<IIQ")
+# sequence number, pts, width, height, format
+SLOT_HEADER = struct.Struct("<QqII16s")
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+DEFAULT_SLOT_COUNT = 4
+
+# AV_NOPTS_VALUE
+NO_PTS = -(1 << 63)
+
+
+def align(size: int):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def get_size(slot_count: int, slot_capacity: int):
+    """Returns the shared memory size of a ring."""
+    return HEADER_SIZE + slot_count * (HEADER_SIZE + align(slot_capacity))
+
+
+@dataclasses.dataclass
+class FrameView:
+    """A frame in a ring, the image is a view of the shared memory.
+
+    The view is only valid until the writer wraps around the ring and reuses
+    the slot, which must be checked with valid() after using the image. The
+    image must also be released before the ring is closed.
+    """
+
+    ring: "SharedFrameRing"
+    sequence: int
+    pts: Optional[int]
+    width: int
+    height: int
+    format: str
+    image: symmetrical_doodle.converters.Image
+
+    def valid(self):
+        return self.ring.read_slot_header(self.sequence)[0] == self.sequence
+
+
+@dataclasses.dataclass
+class SharedFrameRing:
+    """A ring of packed images in shared memory, written by a single writer.
+
+    The sequence numbers start at 1. A slot sequence number is reset to 0
+    while the slot is being written, so that a reader can detect that a frame
+    it holds has been overwritten.
+    """
+
+    shared_memory: multiprocessing.shared_memory.SharedMemory
+    slot_count: int
+    slot_capacity: int
+
+    @classmethod
+    def create(
+        cls,
+        slot_capacity: int,
+        slot_count: int = DEFAULT_SLOT_COUNT,
+        name: Optional[str] = None,
+    ):
+        # the latest frame must not be overwritten by the next one
+        assert slot_count >= 2
+        shared_memory = multiprocessing.shared_memory.SharedMemory(
+            name, create=True, size=get_size(slot_count, slot_capacity)
+        )
+        buf = shared_memory.buf
+        assert buf is not None
+        RING_HEADER.pack_into(buf, 0, slot_count, slot_capacity, 0)
+        return cls(shared_memory, slot_count, slot_capacity)
+
+    @classmethod
+    def attach(cls, name: str):
+        shared_memory = multiprocessing.shared_memory.SharedMemory(name)
+        buf = shared_memory.buf
+        assert buf is not None
+        slot_count, slot_capacity, _ = RING_HEADER.unpack_from(buf, 0)
+        return cls(shared_memory, slot_count, slot_capacity)
+
+    @property
+    def name(self):
+        return self.shared_memory.name
+
+    @property
+    def buf(self):
+        buf = self.shared_memory.buf
+        assert buf is not None
+        return buf
+
+    def get_slot_offset(self, sequence: int):
+        index = sequence % self.slot_count
+        return HEADER_SIZE + index * (HEADER_SIZE + align(self.slot_capacity))
+
+    def get_latest_sequence(self):
+        return RING_HEADER.unpack_from(self.buf, 0)[2]
+
+    def set_latest_sequence(self, sequence: int):
+        RING_HEADER.pack_into(
+            self.buf, 0, self.slot_count, self.slot_capacity, sequence
+        )
+
+    def read_slot_header(self, sequence: int):
+        return SLOT_HEADER.unpack_from(self.buf, self.get_slot_offset(sequence))
+
+    def write_slot_header(
+        self,
+        sequence: int,
+        slot_sequence: int,
+        pts: Optional[int] = None,
+        width: int = 0,
+        height: int = 0,
+        format: str = "",
+    ):
+        SLOT_HEADER.pack_into(
+            self.buf,
+            self.get_slot_offset(sequence),
+            slot_sequence,
+            NO_PTS if pts is None else pts,
+            width,
+            height,
+            format.encode(),
+        )
+
+    def get_image(
+        self, sequence: int, width: int, height: int, channels: int
+    ) -> symmetrical_doodle.converters.Image:
+        size = width * height * channels
+        assert size <= self.slot_capacity
+        offset = self.get_slot_offset(sequence) + HEADER_SIZE
+        return numpy.frombuffer(self.buf, numpy.uint8, size, offset).reshape(
+            height, width, channels
+        )
+
+    def latest(self):
+        """Returns a view of the latest frame, or None if there is none yet."""
+        while True:
+            sequence = self.get_latest_sequence()
+            if sequence == 0:
+                return None
+            slot_sequence, pts, width, height, format = self.read_slot_header(sequence)
+            if slot_sequence != sequence:
+                # overwritten since the latest sequence number was read
+                continue
+            format = format.rstrip(b"\x00").decode()
+            image = self.get_image(
+                sequence, width, height, symmetrical_doodle.converters.CHANNELS[format]
+            )
+            return FrameView(
+                self,
+                sequence,
+                None if pts == NO_PTS else pts,
+                width,
+                height,
+                format,
+                image,
+            )
+
+    def read(self):
+        """Returns a copy of the latest image, or None if there is none yet."""
+        while True:
+            view = self.latest()
+            if view is None:
+                return None
+            image = view.image.copy()
+            if view.valid():
+                return image
+
+    def close(self):
+        """Unmaps the shared memory.
+
+        The images of the views returned by latest() must be released first,
+        otherwise BufferError is raised and the memory stays mapped.
+        """
+        self.shared_memory.close()
+
+    def unlink(self):
+        self.shared_memory.unlink()
+
+
+@dataclasses.dataclass
+class SharedFrameWriter:
+    """A frame sink which converts the frames into a shared frame ring.
+
+    Only the newest frame is converted if the conversion is too slow.
+    """
+
+    ring: SharedFrameRing
+    format: dataclasses.InitVar[str] = "rgb24"
+
+    frame_sink: symmetrical_doodle.frame_buffers.FrameBuffer[av.VideoFrame] = (
+        dataclasses.field(
+            default_factory=symmetrical_doodle.frame_buffers.FrameBuffer, init=False
+        )
+    )
+    converter: symmetrical_doodle.converters.FrameConverter = dataclasses.field(
+        init=False
+    )
+    sequence: int = dataclasses.field(default=0, init=False)
+    """the sequence number of the last frame written"""
+
+    def __post_init__(self, format: str):
+        self.converter = symmetrical_doodle.converters.FrameConverter(format)
+
+    async def put(self, frame: av.VideoFrame):
+        self.frame_sink.put_nowait(frame)
+
+    async def write(self, frame: av.VideoFrame):
+        ring = self.ring
+        sequence = self.sequence + 1
+        # invalidate the views of the frame previously in the slot
+        ring.write_slot_header(sequence, 0)
+        image = ring.get_image(
+            sequence, frame.width, frame.height, self.converter.channels
+        )
+        await self.converter.convert(frame, image)
+        ring.write_slot_header(
+            sequence,
+            sequence,
+            frame.pts,
+            frame.width,
+            frame.height,
+            self.converter.format,
+        )
+        ring.set_latest_sequence(sequence)
+        self.sequence = sequence
+
+    async def run(self):
+        try:
+            while True:
+                await self.write(await self.frame_sink.get())
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops the converter thread, which may still reference the ring.
+
+        Must be called before the ring is closed: the shared memory must not
+        be written after, and it cannot be unmapped while the thread holds a
+        view of it.
+        """
+        self.converter.close(wait=True)
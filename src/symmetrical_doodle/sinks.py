@@ -0,0 +1,9 @@
+from typing import Protocol, TypeVar
+
+T_contra = TypeVar("T_contra", contravariant=True)
+
+
+class Sink(Protocol[T_contra]):
+    """Anything items can be pushed into, such as an asyncio.Queue."""
+
+    async def put(self, item: T_contra, /) -> None: ...
@@ -1,11 +1,67 @@
 import asyncio
 import dataclasses
-from typing import Generic, TypeVar
+import heapq
+from typing import Generic, Optional, TypeVar
 
 T = TypeVar("T")
 
 
+@dataclasses.dataclass
+class Watermark:
+    """Tracks the completion of tasks numbered from 1, completed in any order.
+
+    The value is the highest number up to which all the tasks are completed.
+    """
+
+    last: int = dataclasses.field(default=0, init=False)
+    """the last number given"""
+    value: int = dataclasses.field(default=0, init=False)
+    ahead: set[int] = dataclasses.field(default_factory=set, init=False)
+    """the completed numbers above the value"""
+    waiters: list[tuple[int, int, asyncio.Future[None]]] = dataclasses.field(
+        default_factory=list, init=False
+    )
+    """a heap of (number, id, future)"""
+
+    def next(self):
+        self.last += 1
+        return self.last
+
+    def complete(self, sequence: int):
+        if sequence != self.value + 1:
+            self.ahead.add(sequence)
+            return
+        value = sequence
+        while value + 1 in self.ahead:
+            value += 1
+            self.ahead.remove(value)
+        self.value = value
+
+        waiters = self.waiters
+        while waiters and waiters[0][0] <= value:
+            _, _, future = heapq.heappop(waiters)
+            if not future.done():
+                future.set_result(None)
+
+    async def wait(self, sequence: int):
+        """Waits until all the tasks up to sequence are completed."""
+        if sequence <= self.value:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (sequence, id(future), future))
+        await future
+
+
 @dataclasses.dataclass
 class Task(Generic[T]):
     todo: T
-    event: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
+    event: Optional[asyncio.Event] = dataclasses.field(default_factory=asyncio.Event)
+    """None for fire-and-forget tasks"""
+    sequence: int = 0
+    watermark: Optional[Watermark] = None
+
+    def complete(self):
+        if self.event is not None:
+            self.event.set()
+        if self.watermark is not None:
+            self.watermark.complete(self.sequence)
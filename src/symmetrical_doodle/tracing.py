@@ -0,0 +1,119 @@
+import contextlib
+import dataclasses
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    start: float
+    end: Optional[float] = None
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+
+@dataclasses.dataclass
+class Mark:
+    name: str
+    time: float
+
+
+@dataclasses.dataclass
+class Tracer:
+    """Records the startup phases with monotonic timestamps.
+
+    The spans and marks may be recorded from several threads. Every finished
+    span and every mark is also logged at the debug level.
+    """
+
+    origin: float = dataclasses.field(default_factory=time.monotonic)
+
+    spans: list[Span] = dataclasses.field(default_factory=list, init=False)
+    marks: list[Mark] = dataclasses.field(default_factory=list, init=False)
+    marked: set[str] = dataclasses.field(default_factory=set, init=False)
+    """the names of the marks, for mark_once"""
+    lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, init=False)
+
+    def relative(self, timestamp: float):
+        """Returns the milliseconds elapsed from the origin to a timestamp."""
+        return (timestamp - self.origin) * 1000
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        span = Span(name, time.monotonic())
+        with self.lock:
+            self.spans.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.monotonic()
+            logger.debug(
+                "%s: %.3f ms (at %.3f ms)",
+                name,
+                (span.end - span.start) * 1000,
+                self.relative(span.end),
+            )
+
+    def mark(self, name: str):
+        mark = Mark(name, time.monotonic())
+        with self.lock:
+            self.marks.append(mark)
+            self.marked.add(name)
+        logger.debug("%s at %.3f ms", name, self.relative(mark.time))
+
+    def mark_once(self, name: str):
+        # called for every packet and frame, the lock is only taken until the
+        # mark exists
+        if name in self.marked:
+            return
+        with self.lock:
+            if name in self.marked:
+                return
+            self.marked.add(name)
+        self.mark(name)
+
+    def report(self):
+        """Returns the startup report, with times in milliseconds from the
+        origin."""
+        return {
+            "spans": [
+                {
+                    "name": span.name,
+                    "start": self.relative(span.start),
+                    "end": None if span.end is None else self.relative(span.end),
+                    "duration": (
+                        None if span.duration is None else span.duration * 1000
+                    ),
+                }
+                for span in self.spans
+            ],
+            "marks": [
+                {"name": mark.name, "time": self.relative(mark.time)}
+                for mark in self.marks
+            ],
+        }
+
+    def dumps(self):
+        return json.dumps(self.report(), indent=2)
+
+
+def span(tracer: Optional[Tracer], name: str):
+    """Returns a span of the tracer, or a no-op context if there is none."""
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name)
+
+
+def mark_once(tracer: Optional[Tracer], name: str):
+    if tracer is not None:
+        tracer.mark_once(name)
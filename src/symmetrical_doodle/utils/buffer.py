@@ -1,3 +1,6 @@
+from collections.abc import Buffer
+
+
 def write16be(buf: bytearray, value: int):
     buf.extend(value.to_bytes(2, "big"))
 
@@ -10,15 +13,15 @@ def write64be(buf: bytearray, value: int):
     buf.extend(value.to_bytes(8, "big"))
 
 
-def read32be(buf: bytes, start: int):
-    buf = buf[start : start + 4]
-    assert len(buf) == 4
-    value = int.from_bytes(buf, "big")
+def read32be(buf: Buffer, start: int):
+    view = memoryview(buf)[start : start + 4]
+    assert len(view) == 4
+    value = int.from_bytes(view, "big")
     return value, start + 4
 
 
-def read64be(buf: bytes, start: int):
-    buf = buf[start : start + 8]
-    assert len(buf) == 8
-    value = int.from_bytes(buf, "big")
+def read64be(buf: Buffer, start: int):
+    view = memoryview(buf)[start : start + 8]
+    assert len(view) == 8
+    value = int.from_bytes(view, "big")
     return value, start + 8
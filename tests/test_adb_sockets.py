@@ -0,0 +1,174 @@
+import asyncio
+import pathlib
+import struct
+
+import pytest
+
+import symmetrical_doodle.adb
+import symmetrical_doodle.adb.sockets
+
+DEVICES = b"0123456789abcdef       device usb:2-1 product:MyProduct model:MyModel device:MyDevice transport_id:1\n"
+
+
+def reply_string(data: bytes):
+    return b"OKAY" + b"%04x" % len(data) + data
+
+
+def shell_packet(id: int, data: bytes):
+    return struct.pack("<BI", id, len(data)) + data
+
+
+# path: (mode, data, mtime)
+files: dict[str, tuple[int, bytes, int]] = {}
+sends: list[str] = []
+
+
+async def handle_sync(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    while True:
+        id, length = struct.unpack("<4sI", await reader.readexactly(8))
+        if id == b"QUIT":
+            return
+        path = (await reader.readexactly(length)).decode()
+        if id == b"STAT":
+            mode, data, mtime = files.get(path, (0, b"", 0))
+            writer.write(b"STAT" + struct.pack("<III", mode, len(data), mtime))
+        elif id == b"SEND":
+            path, mode = path.split(",")
+            chunks = []
+            while True:
+                id, length = struct.unpack("<4sI", await reader.readexactly(8))
+                if id == b"DONE":
+                    break
+                assert id == b"DATA"
+                chunks.append(await reader.readexactly(length))
+            files[path] = (0o100000 | int(mode), b"".join(chunks), length)
+            sends.append(path)
+            writer.write(b"OKAY" + struct.pack("<I", 0))
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    async def read_request():
+        length = int(await reader.readexactly(4), 16)
+        return (await reader.readexactly(length)).decode()
+
+    request = await read_request()
+    if request == "host:devices-l":
+        writer.write(reply_string(DEVICES))
+    elif request == "host-serial:0123456789abcdef:forward:tcp:0;localabstract:x":
+        writer.write(b"OKAY" + b"OKAY" + b"0005" + b"27183")
+    elif request == "host-serial:0123456789abcdef:get-serialno":
+        writer.write(reply_string(b"0123456789abcdef"))
+    elif request == "host:transport:0123456789abcdef":
+        writer.write(b"OKAY")
+        request = await read_request()
+        if request == "shell,v2,raw:echo hello":
+            writer.write(
+                b"OKAY" + shell_packet(1, b"hello\n") + shell_packet(3, b"\x00")
+            )
+        elif request == "shell,v2,raw:ls missing":
+            writer.write(
+                b"OKAY" + shell_packet(2, b"No such file\n") + shell_packet(3, b"\x01")
+            )
+        elif request in (
+            "reverse:forward:localabstract:x;tcp:1234",
+            "reverse:killforward:localabstract:x",
+        ):
+            # the first OKAY opens the service, the second one is its status
+            writer.write(b"OKAY" + b"OKAY")
+        elif request == "reverse:forward:localabstract:denied;tcp:1234":
+            writer.write(b"OKAY" + b"FAIL" + b"0006" + b"denied")
+        elif request == "sync:":
+            writer.write(b"OKAY")
+            await handle_sync(reader, writer)
+        else:
+            writer.write(b"FAIL" + b"0006" + b"denied")
+    else:
+        writer.write(b"FAIL" + b"0007" + b"unknown")
+    await writer.drain()
+    writer.close()
+
+
+def test_socket_adb():
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        adb = symmetrical_doodle.adb.sockets.SocketADB(program="adb", port=port)
+
+        [transport] = await adb.list_connected_devices()
+        assert transport.serial == b"0123456789abcdef"
+
+        adb.serial = "0123456789abcdef"
+        assert await adb.get_serialno() == b"0123456789abcdef"
+        assert await adb.forward("tcp:0", "localabstract:x") == 27183
+
+        assert await adb.reverse("localabstract:x", "tcp:1234") is None
+        process = await adb.reverse_remove("localabstract:x")
+        assert process.returncode == 0
+        with pytest.raises(symmetrical_doodle.adb.CalledProcessError) as e:
+            await adb.reverse("localabstract:denied", "tcp:1234")
+        assert e.value.completed_process.stderr == b"denied"
+
+        process = await adb.run_command(
+            ["shell", "echo", "hello"], stdout=asyncio.subprocess.PIPE
+        )
+        assert process.stdout is not None
+        assert await process.stdout.read() == b"hello\n"
+        assert await process.wait() == 0
+
+        # like get_device_ip
+        process = await adb.run_command(
+            ["shell", "echo", "hello"],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        assert await process.communicate() == (b"hello\n", b"")
+        assert process.returncode == 0
+        completed_process = await adb.check(
+            ["shell", "echo", "hello"], stdout=asyncio.subprocess.PIPE
+        )
+        assert completed_process.stdout == b"hello\n"
+
+        # the exit status and stderr are sent separately
+        process = await adb.run_command(
+            ["shell", "ls", "missing"],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        assert await process.communicate() == (b"", b"No such file\n")
+        assert process.returncode == 1
+        with pytest.raises(symmetrical_doodle.adb.CalledProcessError):
+            await adb.check(["shell", "ls", "missing"], stdout=asyncio.subprocess.PIPE)
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
+
+
+def test_socket_adb_push(tmp_path: pathlib.Path):
+    local = tmp_path / "scrcpy-server.jar"
+    local.write_bytes(bytes(range(256)) * 1024)
+    remote = "/data/local/tmp/scrcpy-server.jar"
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        adb = symmetrical_doodle.adb.sockets.SocketADB(program="adb", port=port)
+        adb.serial = "0123456789abcdef"
+
+        for _ in range(2):
+            process = await adb.push([str(local)], remote)
+            assert await process.wait() == 0
+        # the second push is skipped
+        assert sends == [remote]
+        assert files[remote][1] == local.read_bytes()
+
+        local.write_bytes(b"changed")
+        await adb.push([str(local)], remote)
+        assert sends == [remote, remote]
+        assert files[remote][1] == b"changed"
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
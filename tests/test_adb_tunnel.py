@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import symmetrical_doodle.adb
+import symmetrical_doodle.adb_tunnel
+
+
+class FakeADB:
+    def __init__(self, reverse_fails: bool = False):
+        self.calls: list[str] = []
+        self.reverse_fails = reverse_fails
+
+    async def reverse(self, remote: str, local: str):
+        self.calls.append("reverse")
+        if self.reverse_fails:
+            raise symmetrical_doodle.adb.CalledProcessError(
+                symmetrical_doodle.adb.CompletedProcess(
+                    1, "adb", ["reverse", remote, local], b"", b"denied", 0
+                )
+            )
+
+    async def reverse_remove(self, remote: str):
+        self.calls.append("reverse_remove")
+
+    async def forward(self, local: str, remote: str):
+        self.calls.append("forward")
+        return 27183
+
+    async def forward_remove(self, local: str):
+        self.calls.append("forward_remove")
+
+
+def test_tunnel_is_closed():
+    async def main():
+        adb = FakeADB()
+        tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, "scrcpy")  # type: ignore
+        # recreated on each open
+        for _ in range(2):
+            async with tunnel.open():
+                assert tunnel.forward is False
+            assert tunnel.forward is None
+            assert tunnel.server is None
+        assert adb.calls == ["reverse", "reverse_remove"] * 2
+
+    asyncio.run(main())
+
+
+def test_fallback_to_forward():
+    async def main():
+        adb = FakeADB(reverse_fails=True)
+        tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, "scrcpy")  # type: ignore
+        async with tunnel.open():
+            assert tunnel.forward is True
+            assert tunnel.local_port == 27183
+        assert adb.calls == ["reverse", "forward", "forward_remove"]
+
+    asyncio.run(main())
+
+
+def test_kept_tunnel():
+    async def main():
+        adb = FakeADB()
+        tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, "scrcpy")  # type: ignore
+        async with tunnel.open(keep=True):
+            local_port = tunnel.local_port
+        async with tunnel.open(keep=True):
+            assert tunnel.local_port == local_port
+        assert adb.calls == ["reverse"]
+
+        # removed on failure, even if kept
+        with pytest.raises(OSError):
+            async with tunnel.open(keep=True):
+                raise OSError
+        assert adb.calls == ["reverse", "reverse_remove"]
+        assert tunnel.forward is None
+
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+import asyncio
+
+import symmetrical_doodle.buffered_readers
+import symmetrical_doodle.demuxers
+import symmetrical_doodle.packet_mergers
+import symmetrical_doodle.packets
+
+
+async def open_pair(data: bytes, chunk_size: int = 7):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        for i in range(0, len(data), chunk_size):
+            writer.write(data[i : i + chunk_size])
+            await writer.drain()
+            await asyncio.sleep(0)
+        writer.close()
+        await writer.wait_closed()
+
+    server = await asyncio.start_server(handle, host="127.0.0.1", port=0)
+    port = server.sockets[0].getsockname()[1]
+    connection = await asyncio.open_connection(host="127.0.0.1", port=port)
+    return server, connection
+
+
+def test_readexactly_and_readinto():
+    data = bytes(range(256)) * 64
+
+    async def main():
+        server, connection = await open_pair(data)
+        # consume a prefix through the stream reader before taking over
+        assert await connection[0].readexactly(3) == data[:3]
+        reader = await symmetrical_doodle.buffered_readers.take_over(
+            connection, capacity=16
+        )
+        assert bytes(await reader.readexactly(5)) == data[3:8]
+        buf = bytearray(len(data) - 8)
+        await reader.readinto(memoryview(buf))
+        assert bytes(buf) == data[8:]
+        server.close()
+        connection[1].close()
+
+    asyncio.run(main())
+
+
+def test_receive_packet_merges_config():
+    def header(pts_flags: int, length: int):
+        return pts_flags.to_bytes(8, "big") + length.to_bytes(4, "big")
+
+    config = b"\x00\x00\x00\x01config"
+    payload = b"\x00\x00\x00\x01frame" * 100
+    data = (
+        header(symmetrical_doodle.demuxers.PACKET_FLAG_CONFIG, len(config))
+        + config
+        + header(symmetrical_doodle.demuxers.PACKET_FLAG_KEY_FRAME | 42, len(payload))
+        + payload
+    )
+
+    async def main():
+        server, connection = await open_pair(data)
+        demuxer = symmetrical_doodle.demuxers.Demuxer(connection)
+        merger = symmetrical_doodle.packet_mergers.Merger()
+
+        packet = await demuxer.receive_packet(merger)
+        assert packet.pts is None
+        assert bytes(packet.input) == config
+
+        packet = await demuxer.receive_packet(merger)
+        assert packet.pts == 42
+        assert bytes(packet.input) == config + payload
+        assert bytes(packet.create_av_packet()) == config + payload
+        assert merger.config is None
+
+        server.close()
+        connection[1].close()
+
+    asyncio.run(main())
+
+
+def test_demuxer_ends_stream_on_connection_error():
+    data = (
+        symmetrical_doodle.demuxers.CodecID.H264.value.to_bytes(4, "big")
+        + (1920).to_bytes(4, "big")
+        + (1080).to_bytes(4, "big")
+    )
+
+    async def main():
+        demuxer = symmetrical_doodle.demuxers.Demuxer(
+            (asyncio.StreamReader(), None)  # type: ignore
+        )
+        reader = symmetrical_doodle.buffered_readers.BufferedReader()
+        reader.feed(data)
+        # the next wait fails, like after a connection reset
+        reader.exception = ConnectionResetError()
+        demuxer.reader = reader
+
+        items: asyncio.Queue[object] = asyncio.Queue()
+        demuxer.sinks.append(items)
+        await asyncio.wait_for(demuxer.run(), 1)
+        assert isinstance(
+            items.get_nowait(), symmetrical_doodle.packets.VideoCodecContext
+        )
+        assert isinstance(items.get_nowait(), symmetrical_doodle.packets.EndOfStream)
+
+    asyncio.run(main())
@@ -135,3 +135,20 @@ def test_serialize_rotate_device():
     message = symmetrical_doodle.control_message.RotateDevice()
     buf = message.serialize()
     assert buf == b"\x0b"
+
+
+def test_serializer():
+    messages = [
+        symmetrical_doodle.control_message.InjectText(text=b"hello, world!"),
+        symmetrical_doodle.control_message.BackOrScreenOn(
+            action=symmetrical_doodle.android.input.KeyEventAction.AKEY_EVENT_ACTION_UP
+        ),
+        symmetrical_doodle.control_message.RotateDevice(),
+    ]
+    serializer = symmetrical_doodle.control_message.Serializer()
+    expected = b"".join(message.serialize() for message in messages)
+    assert serializer.serialize(messages) == expected
+    # the buffer is reused
+    buf = serializer.buf
+    assert serializer.serialize(messages[1:]) == expected[-3:]
+    assert serializer.buf is buf
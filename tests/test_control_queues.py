@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+import symmetrical_doodle.android.input
+import symmetrical_doodle.android.keycodes
+import symmetrical_doodle.control_message
+import symmetrical_doodle.control_queues
+import symmetrical_doodle.coords
+import symmetrical_doodle.tasks
+
+MotionEventAction = symmetrical_doodle.android.input.MotionEventAction
+
+
+def create_touch_event(action: MotionEventAction, x: int = 0):
+    return symmetrical_doodle.control_message.InjectTouchEvent(
+        action=action,
+        buttons=0,
+        pointer_id=0,
+        position=symmetrical_doodle.coords.Position(
+            symmetrical_doodle.coords.Size(1080, 1920),
+            symmetrical_doodle.coords.Point(x, 0),
+        ),
+        pressure=1.0,
+    )
+
+
+def create_key_up():
+    return symmetrical_doodle.control_message.InjectKeycode(
+        action=symmetrical_doodle.android.input.KeyEventAction.AKEY_EVENT_ACTION_UP,
+        keycode=symmetrical_doodle.android.keycodes.Keycode.AKEYCODE_ENTER,
+        repeat=0,
+        meta_state=0,
+    )
+
+
+def get_all(queue: symmetrical_doodle.control_queues.ControlQueue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait().todo)
+    return messages
+
+
+def test_priority():
+    async def main():
+        queue = symmetrical_doodle.control_queues.ControlQueue()
+        down = create_touch_event(MotionEventAction.AMOTION_EVENT_ACTION_DOWN)
+        moves = [
+            create_touch_event(MotionEventAction.AMOTION_EVENT_ACTION_MOVE, x)
+            for x in range(3)
+        ]
+        key_up = create_key_up()
+        power = symmetrical_doodle.control_message.SetScreenPowerMode(
+            symmetrical_doodle.control_message.ScreenPowerMode.NORMAL
+        )
+        for message in [down, *moves, key_up, power]:
+            await queue.put(symmetrical_doodle.tasks.Task(message))
+        assert queue.qsize() == 6
+        assert get_all(queue) == [power, key_up, down, *moves]
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+    asyncio.run(main())
+
+
+def test_drop_oldest_move():
+    async def main():
+        queue = symmetrical_doodle.control_queues.ControlQueue()
+        motion = queue.lanes[symmetrical_doodle.control_queues.Lane.MOTION]
+        motion.maxsize = 2
+        down = create_touch_event(MotionEventAction.AMOTION_EVENT_ACTION_DOWN)
+        moves = [
+            create_touch_event(MotionEventAction.AMOTION_EVENT_ACTION_MOVE, x)
+            for x in range(3)
+        ]
+        tasks: list[symmetrical_doodle.control_queues.ControlTask] = [
+            symmetrical_doodle.tasks.Task(m) for m in [down, *moves]
+        ]
+        for task in tasks:
+            queue.put_nowait(task)
+        # the down is kept, the first moves are dropped
+        assert get_all(queue) == [down, moves[2]]
+        assert motion.dropped == 2
+        for task in tasks[1:3]:
+            assert task.event is not None
+            assert task.event.is_set()
+
+    asyncio.run(main())
+
+
+def test_block():
+    async def main():
+        queue = symmetrical_doodle.control_queues.ControlQueue()
+        queue.lanes[symmetrical_doodle.control_queues.Lane.KEY].maxsize = 1
+        queue.put_nowait(symmetrical_doodle.tasks.Task(create_key_up()))
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(symmetrical_doodle.tasks.Task(create_key_up()))
+
+        put = asyncio.create_task(
+            queue.put(symmetrical_doodle.tasks.Task(create_key_up()))
+        )
+        await asyncio.sleep(0)
+        assert not put.done()
+        await queue.get()
+        await asyncio.wait_for(put, 1)
+        assert queue.qsize() == 1
+
+    asyncio.run(main())
+
+
+def test_put_many():
+    async def main():
+        queue = symmetrical_doodle.control_queues.ControlQueue()
+        queue.lanes[symmetrical_doodle.control_queues.Lane.KEY].maxsize = 3
+        queue.put_nowait(symmetrical_doodle.tasks.Task(create_key_up()))
+        queue.put_nowait(symmetrical_doodle.tasks.Task(create_key_up()))
+        messages = [create_key_up(), create_key_up()]
+
+        # not enough room for both
+        put = asyncio.create_task(
+            queue.put_many([symmetrical_doodle.tasks.Task(m) for m in messages])
+        )
+        await asyncio.sleep(0)
+        assert not put.done()
+        await queue.get()
+        await asyncio.wait_for(put, 1)
+        assert get_all(queue)[1:] == messages
+
+        # more tasks than the bound go into an empty lane
+        messages = [create_key_up() for _ in range(5)]
+        await asyncio.wait_for(
+            queue.put_many([symmetrical_doodle.tasks.Task(m) for m in messages]), 1
+        )
+        assert get_all(queue) == messages
+
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import asyncio
+
+import symmetrical_doodle.android.input
+import symmetrical_doodle.control_message
+import symmetrical_doodle.controllers
+import symmetrical_doodle.coords
+
+
+class FakeWriter:
+    def __init__(self):
+        self.writes: list[bytes] = []
+
+    def write(self, data: bytes):
+        self.writes.append(data)
+
+    async def drain(self):
+        await asyncio.sleep(0)
+
+
+def test_controller_batches():
+    async def main():
+        writer = FakeWriter()
+        controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), writer)  # type: ignore
+        )
+        messages = [
+            symmetrical_doodle.control_message.RotateDevice(),
+            symmetrical_doodle.control_message.CollapsePanels(),
+            symmetrical_doodle.control_message.ExpandSettingsPanel(),
+        ]
+        events = [controller.push_message_nowait(message) for message in messages]
+        task = asyncio.create_task(controller.run())
+        await asyncio.wait_for(events[-1].wait(), 1)
+        assert all(event.is_set() for event in events)
+        assert writer.writes == [b"\x0b\x07\x06"]
+
+        event = await controller.push_message(messages[0])
+        await asyncio.wait_for(event.wait(), 1)
+        assert writer.writes == [b"\x0b\x07\x06", b"\x0b"]
+        assert controller.batch_sizes == {3: 1, 1: 1}
+        assert controller.get_mean_batch_size() == 2
+
+        task.cancel()
+
+    asyncio.run(main())
+
+
+def create_touch_event(
+    action: symmetrical_doodle.android.input.MotionEventAction, pointer_id: int, x: int
+):
+    return symmetrical_doodle.control_message.InjectTouchEvent(
+        action=action,
+        buttons=0,
+        pointer_id=pointer_id,
+        position=symmetrical_doodle.coords.Position(
+            symmetrical_doodle.coords.Size(1080, 1920),
+            symmetrical_doodle.coords.Point(x, 0),
+        ),
+        pressure=1.0,
+    )
+
+
+DOWN = symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_DOWN
+UP = symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_UP
+MOVE = symmetrical_doodle.android.input.MotionEventAction.AMOTION_EVENT_ACTION_MOVE
+
+
+def test_controller_coalesces_moves():
+    async def main():
+        writer = FakeWriter()
+        controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), writer)  # type: ignore
+        )
+        messages = [
+            create_touch_event(DOWN, 1, 0),
+            create_touch_event(MOVE, 1, 1),
+            create_touch_event(MOVE, 1, 2),
+            create_touch_event(MOVE, 2, 3),
+            create_touch_event(MOVE, 1, 4),
+            create_touch_event(UP, 1, 4),
+            create_touch_event(MOVE, 1, 5),
+        ]
+        events = [controller.push_message_nowait(message) for message in messages]
+        task = asyncio.create_task(controller.run())
+        await asyncio.wait_for(events[-1].wait(), 1)
+        assert all(event.is_set() for event in events)
+
+        expected = [messages[i] for i in (0, 3, 4, 5, 6)]
+        assert writer.writes == [b"".join(message.serialize() for message in expected)]
+        assert controller.collapsed == 2
+
+        task.cancel()
+
+    asyncio.run(main())
+
+
+def test_controller_limits_move_rate():
+    async def main():
+        loop = asyncio.get_running_loop()
+        writer = FakeWriter()
+        controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), writer), max_move_rate=20  # type: ignore
+        )
+        task = asyncio.create_task(controller.run())
+
+        first = await controller.push_message(create_touch_event(MOVE, 1, 0))
+        await first.wait()
+        start = loop.time()
+        second = await controller.push_message(create_touch_event(MOVE, 1, 1))
+        await asyncio.sleep(0.01)
+        third = await controller.push_message(create_touch_event(MOVE, 1, 2))
+        await asyncio.wait_for(third.wait(), 1)
+        # held back until 50 ms after the first move, then replaced
+        assert loop.time() - start >= 0.04
+        assert second.is_set()
+        assert controller.collapsed == 1
+        assert writer.writes == [
+            create_touch_event(MOVE, 1, 0).serialize(),
+            create_touch_event(MOVE, 1, 2).serialize(),
+        ]
+
+        task.cancel()
+
+    asyncio.run(main())
+
+
+def test_controller_post():
+    async def main():
+        writer = FakeWriter()
+        controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), writer)  # type: ignore
+        )
+        sequences = [controller.post(create_touch_event(MOVE, 1, x)) for x in range(3)]
+        assert sequences == [1, 2, 3]
+        assert controller.flushed == 0
+        task = asyncio.create_task(controller.run())
+        await asyncio.wait_for(controller.wait_flushed(sequences[-1]), 1)
+        # the first moves were collapsed, which also completes them
+        assert controller.flushed == 3
+        assert writer.writes == [create_touch_event(MOVE, 1, 2).serialize()]
+
+        task.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+import asyncio
+
+import av
+import numpy
+
+import symmetrical_doodle.converters
+
+
+def create_frame(width: int, height: int):
+    rng = numpy.random.default_rng(0)
+    image = rng.integers(0, 256, (height, width, 3), numpy.uint8)
+    return av.VideoFrame.from_ndarray(image, format="rgb24").reformat(format="yuv420p")
+
+
+def test_convert_matches_to_ndarray():
+    # an odd width makes the line size larger than the row size
+    frame = create_frame(31, 20)
+    converter = symmetrical_doodle.converters.FrameConverter("bgr24")
+    image = converter.convert_nowait(frame)
+    assert numpy.array_equal(image, frame.to_ndarray(format="bgr24"))
+
+
+def test_convert_does_not_copy():
+    frame = create_frame(32, 16)
+    converter = symmetrical_doodle.converters.FrameConverter()
+
+    async def main():
+        image = await converter.convert(frame)
+        converter.close()
+        return image
+
+    image = asyncio.run(main())
+    assert not image.flags.owndata
+    assert image.shape == (16, 32, 3)
+
+
+def test_convert_into_image():
+    frame = create_frame(31, 20)
+    converter = symmetrical_doodle.converters.FrameConverter()
+    image = numpy.zeros((20, 31, 3), numpy.uint8)
+    assert converter.convert_nowait(frame, image) is image
+    assert numpy.array_equal(image, frame.to_ndarray(format="rgb24"))
+
+
+def test_yuv_to_rgb_matrix_matches_swscale():
+    frame = create_frame(32, 16)
+    matrix, offset = symmetrical_doodle.converters.get_yuv_to_rgb_matrix(
+        frame.colorspace, frame.color_range, frame.height
+    )
+    y, u, v = (
+        numpy.frombuffer(plane, numpy.uint8).reshape(plane.height, plane.line_size)[
+            :, : plane.width
+        ]
+        for plane in frame.planes
+    )
+    # nearest neighbour chroma, like the shader sampling at the pixel centers
+    u = u.repeat(2, 0).repeat(2, 1)
+    v = v.repeat(2, 0).repeat(2, 1)
+    yuv = numpy.stack([y, u, v], axis=-1) / 255 - offset
+    rgb = numpy.clip(yuv @ numpy.array(matrix).T, 0, 1) * 255
+    expected = frame.to_ndarray(format="rgb24")
+    assert numpy.abs(rgb - expected).max() <= 3
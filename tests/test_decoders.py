@@ -0,0 +1,67 @@
+import asyncio
+import fractions
+
+import av
+import av.codec.context
+import numpy
+import pytest
+
+import symmetrical_doodle.decoders
+import symmetrical_doodle.packets
+
+WIDTH = 64
+HEIGHT = 48
+
+
+def encode(count: int):
+    encoder = av.CodecContext.create("libx264", "w")
+    assert isinstance(encoder, av.VideoCodecContext)
+    encoder.width = WIDTH
+    encoder.height = HEIGHT
+    encoder.pix_fmt = "yuv420p"
+    encoder.time_base = fractions.Fraction(1, 1000000)
+    encoder.framerate = fractions.Fraction(60)
+    # B-frames make the decoder buffer frames
+    encoder.options = {"bframes": "2"}
+    packets: list[av.Packet] = []
+    for i in range(count):
+        image = numpy.full((HEIGHT, WIDTH, 3), i * 8, numpy.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="rgb24")
+        frame.pts = i * 16666
+        packets.extend(encoder.encode(frame.reformat(format="yuv420p")))
+    packets.extend(encoder.encode(None))
+    return packets
+
+
+@pytest.mark.skipif(
+    "libx264" not in av.codecs_available, reason="libx264 is not available"
+)
+@pytest.mark.parametrize("threaded", [False, True])
+def test_decode_multiple_frames_and_drain(threaded: bool):
+    count = 20
+
+    async def main():
+        decoder = symmetrical_doodle.decoders.Decoder(
+            threaded=threaded, thread_count=4, thread_type="FRAME"
+        )
+        frame_sink: asyncio.Queue[av.VideoFrame] = asyncio.Queue()
+        decoder.sinks.append(frame_sink)
+
+        await decoder.packet_sink.put(
+            symmetrical_doodle.packets.VideoCodecContext(
+                av.codec.Codec("h264"), 0, WIDTH, HEIGHT, "yuv420p"
+            )
+        )
+        for av_packet in encode(count):
+            packet = symmetrical_doodle.packets.Packet(bytes(av_packet))
+            packet.pts = av_packet.pts
+            packet.dts = av_packet.dts
+            await decoder.packet_sink.put(packet)
+        await decoder.packet_sink.put(symmetrical_doodle.packets.EndOfStream())
+
+        await decoder.run()
+        assert decoder.max_delay > 0
+        assert decoder.delay == 0
+        assert frame_sink.qsize() == count
+
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+import symmetrical_doodle.frame_buffers
+
+
+def test_frame_buffer_keeps_newest():
+    buffer = symmetrical_doodle.frame_buffers.FrameBuffer[int]()
+    buffer.put_nowait(1)
+    buffer.put_nowait(2)
+    buffer.put_nowait(3)
+    assert buffer.get_nowait() == 3
+    assert buffer.consume_skipped() == 2
+    assert buffer.consume_skipped() == 0
+    with pytest.raises(asyncio.QueueEmpty):
+        buffer.get_nowait()
+
+
+def test_frame_buffer_get_waits():
+    async def main():
+        buffer = symmetrical_doodle.frame_buffers.FrameBuffer[int]()
+        task = asyncio.create_task(buffer.get())
+        await asyncio.sleep(0)
+        assert not task.done()
+        await buffer.put(4)
+        assert await task == 4
+
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+import asyncio
+import math
+import time
+
+import symmetrical_doodle.android.input
+import symmetrical_doodle.control_message
+import symmetrical_doodle.controllers
+import symmetrical_doodle.coords
+import symmetrical_doodle.gestures
+
+SCREEN_SIZE = symmetrical_doodle.coords.Size(1080, 1920)
+
+
+class FakeWriter:
+    def __init__(self):
+        self.writes: list[bytes] = []
+
+    def write(self, data: bytes):
+        self.writes.append(data)
+
+    async def drain(self):
+        await asyncio.sleep(0)
+
+
+def test_tap():
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).tap(100, 200)
+    batches = timeline.get_batches()
+    assert len(batches) == 1
+    start, messages = batches[0]
+    assert start == 0.0
+    assert [message.action for message in messages] == [
+        symmetrical_doodle.gestures.ACTION_DOWN,
+        symmetrical_doodle.gestures.ACTION_UP,
+    ]
+    assert messages[0].position.point == symmetrical_doodle.coords.Point(100, 200)
+
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).long_press(100, 200)
+    assert len(timeline.get_batches()) == 2
+    assert timeline.duration == symmetrical_doodle.gestures.LONG_PRESS_DURATION
+
+
+def test_swipe():
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).swipe(
+        0, 0, 100, 0, duration=0.1, interval=0.01
+    )
+    batches = timeline.get_batches()
+    assert len(batches) == 11
+    assert batches[0][1][0].action == symmetrical_doodle.gestures.ACTION_DOWN
+    assert [message.action for message in batches[-1][1]] == [
+        symmetrical_doodle.gestures.ACTION_MOVE,
+        symmetrical_doodle.gestures.ACTION_UP,
+    ]
+    xs = [messages[0].position.point.x for _, messages in batches]
+    assert xs == sorted(xs)
+    assert xs[0] == 0 and xs[-1] == 100
+
+
+def test_pinch():
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).pinch(
+        540, 960, 100, 500, duration=0.1, interval=0.01
+    )
+    _, messages = timeline.get_batches()[0]
+    assert [message.pointer_id for message in messages] == [
+        symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+        symmetrical_doodle.control_message.POINTER_ID_VIRTUAL_FINGER,
+    ]
+    assert [message.position.point.x for message in messages] == [590, 490]
+    _, messages = timeline.get_batches()[-1]
+    assert {message.position.point.x for message in messages} == {790, 290}
+
+
+def test_two_fingers_are_lifted_last():
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).pinch(
+        540, 960, 100, 500, duration=0.1, interval=0.01
+    )
+    time, messages = timeline.get_batches()[-1]
+    assert time == 0.1
+    # both end points are reached before either finger is lifted
+    assert [(message.action, message.pointer_id) for message in messages] == [
+        (
+            symmetrical_doodle.gestures.ACTION_MOVE,
+            symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+        ),
+        (
+            symmetrical_doodle.gestures.ACTION_MOVE,
+            symmetrical_doodle.control_message.POINTER_ID_VIRTUAL_FINGER,
+        ),
+        (
+            symmetrical_doodle.gestures.ACTION_UP,
+            symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+        ),
+        (
+            symmetrical_doodle.gestures.ACTION_UP,
+            symmetrical_doodle.control_message.POINTER_ID_VIRTUAL_FINGER,
+        ),
+    ]
+
+
+def test_rotate():
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).rotate(
+        540, 960, 200, 0, math.pi / 2, duration=0.1, interval=0.01
+    )
+    _, messages = timeline.get_batches()[-1]
+    assert {
+        (message.position.point.x, message.position.point.y) for message in messages
+    } == {(540, 1060), (540, 860)}
+
+
+def test_steps():
+    # exact multiples, whose division is not exact in floats
+    for duration, interval in [(0.07, 0.01), (0.035, 0.005), (0.14, 0.01)]:
+        steps = symmetrical_doodle.gestures.get_steps(duration, interval)
+        assert len(steps) == round(duration / interval) - 1
+        assert steps[-1] < duration - interval / 2
+    assert len(symmetrical_doodle.gestures.get_steps(0.075, 0.01)) == 7
+
+    timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).swipe(
+        0, 0, 100, 0, duration=0.07, interval=0.01
+    )
+    _, messages = timeline.get_batches()[-1]
+    assert [message.action for message in messages] == [
+        symmetrical_doodle.gestures.ACTION_MOVE,
+        symmetrical_doodle.gestures.ACTION_UP,
+    ]
+
+
+def test_play():
+    async def main():
+        writer = FakeWriter()
+        controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), writer)  # type: ignore
+        )
+        task = asyncio.create_task(controller.run())
+        timeline = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).swipe(
+            0, 0, 100, 100, duration=0.1, interval=0.01
+        )
+        start = time.monotonic()
+        await symmetrical_doodle.gestures.play(controller, timeline)
+        elapsed = time.monotonic() - start
+        task.cancel()
+
+        batches = timeline.get_batches()
+        # through the queue, all written once play returns
+        assert controller.flushed == controller.watermark.last
+        assert 0 < len(writer.writes) <= len(batches)
+        assert elapsed >= timeline.duration
+        serializer = symmetrical_doodle.control_message.Serializer()
+        assert writer.writes[-1].endswith(bytes(serializer.serialize(batches[-1][1])))
+
+    asyncio.run(main())
+
+
+def test_batches_are_not_interleaved():
+    async def main():
+        controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), FakeWriter())  # type: ignore
+        )
+        tap = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE).tap(100, 200)
+        move = symmetrical_doodle.gestures.Timeline(SCREEN_SIZE)
+        move.add(
+            0.0,
+            symmetrical_doodle.gestures.ACTION_MOVE,
+            symmetrical_doodle.control_message.POINTER_ID_MOUSE,
+            0,
+            0,
+        )
+        controller.post(move.events[0].message)
+        [(_, messages)] = tap.get_batches()
+        sequence = await controller.push_messages(messages)
+        controller.post(move.events[0].message)
+        queued = [task.todo for task in controller.get_queued()]
+        assert queued == [move.events[0].message, *messages, move.events[0].message]
+        assert sequence == 3
+
+    asyncio.run(main())
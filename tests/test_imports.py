@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import symmetrical_doodle
+
+HEAVY_MODULES = ("av", "numpy", "PySide6", "symmetrical_doodle.android.keycodes")
+
+
+def get_import_times(module: str):
+    """Returns the cumulative import time of each module imported by a fresh
+    interpreter importing module, from python -X importtime.
+
+    The times themselves are not checked, they depend too much on the
+    machine, only which modules are imported.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(sys.path)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        env=env,
+        check=True,
+        text=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        pytest.param(
+            "symmetrical_doodle.scrcpy",
+            marks=pytest.mark.skipif(
+                sys.version_info < (3, 12), reason="requires Python 3.12"
+            ),
+        ),
+        "symmetrical_doodle.servers",
+        "symmetrical_doodle.controllers",
+    ],
+)
+def test_heavy_modules_not_imported(module: str):
+    times = get_import_times(module)
+    for heavy_module in HEAVY_MODULES:
+        assert heavy_module not in times
+
+
+def test_lazy_submodule():
+    assert symmetrical_doodle.packets.Packet is not None
+    with pytest.raises(AttributeError):
+        symmetrical_doodle.missing
@@ -0,0 +1,68 @@
+import asyncio
+
+import symmetrical_doodle.packet_queues
+import symmetrical_doodle.packets
+
+
+def create_packet(pts: int | None, key_frame: bool = False):
+    packet = symmetrical_doodle.packets.Packet(b"\x00")
+    packet.pts = pts
+    if key_frame:
+        packet.flags |= symmetrical_doodle.packets.AV_PKT_FLAG_KEY
+    return packet
+
+
+def drain(queue: symmetrical_doodle.packet_queues.PacketQueue):
+    items = []
+    while not queue.empty():
+        item = queue.get_nowait()
+        assert isinstance(item, symmetrical_doodle.packets.Packet)
+        items.append(item.pts)
+    return items
+
+
+def test_drop_non_key():
+    queue = symmetrical_doodle.packet_queues.PacketQueue(
+        2, symmetrical_doodle.packet_queues.OverflowPolicy.DROP_NON_KEY
+    )
+    for packet in [
+        create_packet(0, key_frame=True),
+        create_packet(1),
+        create_packet(2),
+        create_packet(3),
+        create_packet(None),
+        create_packet(4, key_frame=True),
+        create_packet(5),
+    ]:
+        queue.put_nowait(packet)
+    assert queue.dropped == 5
+    assert drain(queue) == [None, 4]
+
+
+def test_drop_oldest():
+    queue = symmetrical_doodle.packet_queues.PacketQueue(
+        2, symmetrical_doodle.packet_queues.OverflowPolicy.DROP_OLDEST
+    )
+    for pts in range(5):
+        queue.put_nowait(create_packet(pts))
+    assert queue.dropped == 3
+    assert queue.max_depth == 2
+    assert drain(queue) == [3, 4]
+
+
+def test_block():
+    async def main():
+        queue = symmetrical_doodle.packet_queues.PacketQueue(1)
+        await queue.put(create_packet(0))
+        task = asyncio.create_task(queue.put(create_packet(1)))
+        await asyncio.sleep(0)
+        assert not task.done()
+        assert queue.qsize() == 1
+        item = await queue.get()
+        assert isinstance(item, symmetrical_doodle.packets.Packet)
+        assert item.pts == 0
+        await task
+        assert drain(queue) == [1]
+        assert queue.dropped == 0
+
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+import asyncio
+
+import av
+import pytest
+
+pyside_screens = pytest.importorskip("symmetrical_doodle.screens.pyside_screens")
+
+
+class Signal:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, item):
+        self.emitted.append(item)
+
+
+def test_frame_receiver_waits_for_presentation():
+    signal = Signal()
+    frame_receiver = pyside_screens.FrameReceiver(signal, converter=None)  # type: ignore
+
+    async def main():
+        task = asyncio.create_task(frame_receiver.run())
+        frames = [av.VideoFrame(16, 16, "yuv420p") for _ in range(3)]
+        for frame in frames:
+            frame_receiver.frame_sink.put_nowait(frame)
+            await asyncio.sleep(0.01)
+        # only the first one was emitted, the others replaced each other
+        assert signal.emitted == frames[:1]
+        frame_receiver.presented()
+        await asyncio.sleep(0.01)
+        assert signal.emitted == [frames[0], frames[2]]
+        task.cancel()
+
+    asyncio.run(main())
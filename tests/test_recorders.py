@@ -0,0 +1,119 @@
+import asyncio
+import fractions
+import pathlib
+
+import av
+import av.codec.context
+import numpy
+import pytest
+
+import symmetrical_doodle.options
+import symmetrical_doodle.packets
+import symmetrical_doodle.recorders
+
+WIDTH = 64
+HEIGHT = 48
+
+
+def encode(count: int):
+    encoder = av.CodecContext.create("libx264", "w")
+    assert isinstance(encoder, av.VideoCodecContext)
+    encoder.width = WIDTH
+    encoder.height = HEIGHT
+    encoder.pix_fmt = "yuv420p"
+    encoder.time_base = fractions.Fraction(1, 1000000)
+    encoder.framerate = fractions.Fraction(60)
+    # the config is sent separately, like the device does
+    encoder.flags |= av.codec.context.Flags.global_header
+    encoder.options = {"tune": "zerolatency"}
+    packets: list[av.Packet] = []
+    for i in range(count):
+        image = numpy.full((HEIGHT, WIDTH, 3), i * 8, numpy.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="rgb24")
+        frame.pts = i * 16666
+        packets.extend(encoder.encode(frame.reformat(format="yuv420p")))
+    packets.extend(encoder.encode(None))
+    assert encoder.extradata is not None
+    return bytes(encoder.extradata), packets
+
+
+@pytest.mark.skipif(
+    "libx264" not in av.codecs_available, reason="libx264 is not available"
+)
+@pytest.mark.parametrize(
+    "record_format",
+    [
+        symmetrical_doodle.options.RecordFormat.MP4,
+        symmetrical_doodle.options.RecordFormat.MKV,
+    ],
+)
+@pytest.mark.parametrize("merged", [False, True])
+def test_record(
+    tmp_path: pathlib.Path,
+    record_format: symmetrical_doodle.options.RecordFormat,
+    merged: bool,
+):
+    count = 10
+    config, av_packets = encode(count)
+    filename = str(tmp_path / "record")
+
+    async def main():
+        recorder = symmetrical_doodle.recorders.Recorder(filename, record_format)
+        task = asyncio.create_task(recorder.run())
+
+        await recorder.put(
+            symmetrical_doodle.packets.VideoCodecContext(
+                av.codec.Codec("h264"), 0, WIDTH, HEIGHT, "yuv420p"
+            )
+        )
+        await recorder.put(symmetrical_doodle.packets.Packet(config))
+        for i, av_packet in enumerate(av_packets):
+            data = bytes(av_packet)
+            if merged and i == 0:
+                # like the demuxer does for H.264 and H.265
+                data = config + data
+            packet = symmetrical_doodle.packets.Packet(data)
+            packet.pts = av_packet.pts
+            packet.dts = av_packet.dts
+            if av_packet.is_keyframe:
+                packet.flags |= symmetrical_doodle.packets.AV_PKT_FLAG_KEY
+            await recorder.put(packet)
+        await recorder.put(symmetrical_doodle.packets.EndOfStream())
+
+        await task
+
+    asyncio.run(main())
+
+    with av.open(filename) as container:
+        stream = container.streams.video[0]
+        assert stream.codec_context.extradata is not None
+        assert (stream.codec_context.width, stream.codec_context.height) == (
+            WIDTH,
+            HEIGHT,
+        )
+        frames = list(container.decode(stream))
+    assert len(frames) == count
+    assert frames[-1].time == pytest.approx((count - 1) * 16666 / 1000000, abs=1e-3)
+
+
+def test_put_does_not_block(tmp_path: pathlib.Path):
+    async def main():
+        recorder = symmetrical_doodle.recorders.Recorder(
+            str(tmp_path / "record.mkv"),
+            symmetrical_doodle.options.RecordFormat.MKV,
+            maxsize=2,
+        )
+        # nothing is written, the queue stays full
+        for pts in range(10):
+            packet = symmetrical_doodle.packets.Packet(b"frame")
+            packet.pts = pts
+            if pts == 5:
+                packet.flags |= symmetrical_doodle.packets.AV_PKT_FLAG_KEY
+            await asyncio.wait_for(recorder.put(packet), 1)
+        assert recorder.packet_queue.qsize() == 2
+        assert recorder.packet_queue.dropped == 8
+
+        await recorder.put(symmetrical_doodle.packets.EndOfStream())
+        await asyncio.wait_for(recorder.run(), 1)
+
+    asyncio.run(main())
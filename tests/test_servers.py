@@ -0,0 +1,195 @@
+import asyncio
+import pathlib
+import socket
+
+import pytest
+
+import symmetrical_doodle.adb_tunnel
+import symmetrical_doodle.servers
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeOpenConnection:
+    """Refuses the connections until accepting is set."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.accepting = False
+
+    async def __call__(self, host: str, port: int):
+        self.attempts += 1
+        if not self.accepting:
+            raise ConnectionRefusedError
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"\x00")
+        return reader, None
+
+
+def test_retry_connect_backoff(monkeypatch: pytest.MonkeyPatch):
+    open_connection = FakeOpenConnection()
+    monkeypatch.setattr(asyncio, "open_connection", open_connection)
+    delays: list[float] = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay: float):
+        delays.append(delay)
+        if len(delays) == 8:
+            open_connection.accepting = True
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    async def main():
+        await symmetrical_doodle.servers.retry_connect(
+            "127.0.0.1", 0, initial_delay=0.002, max_delay=0.1
+        )
+
+    asyncio.run(main())
+    assert open_connection.attempts == 9
+    assert delays == pytest.approx([0.002, 0.004, 0.008, 0.016, 0.032, 0.064, 0.1, 0.1])
+
+
+def test_retry_connect_ready(monkeypatch: pytest.MonkeyPatch):
+    open_connection = FakeOpenConnection()
+    monkeypatch.setattr(asyncio, "open_connection", open_connection)
+
+    async def main():
+        ready = asyncio.Event()
+
+        async def start_later():
+            await asyncio.sleep(0.01)
+            open_connection.accepting = True
+            ready.set()
+
+        task = asyncio.create_task(start_later())
+        # the ready event cuts the delays short
+        await asyncio.wait_for(
+            symmetrical_doodle.servers.retry_connect(
+                "127.0.0.1", 0, ready, initial_delay=10, max_delay=10
+            ),
+            5,
+        )
+        await task
+
+    asyncio.run(main())
+    assert open_connection.attempts == 2
+
+
+def test_retry_connect_timeout():
+    port = get_free_port()
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await symmetrical_doodle.servers.retry_connect(
+                "127.0.0.1", port, timeout=0.05
+            )
+
+    asyncio.run(main())
+
+
+class FailingPushADB:
+    def __init__(self):
+        self.calls: list[str] = []
+
+    async def push(self, locals: list[str], remote: str):
+        # fails while the tunnel is still being set up
+        await asyncio.sleep(0)
+        raise OSError
+
+    async def reverse(self, remote: str, local: str):
+        await asyncio.sleep(0.01)
+        self.calls.append("reverse")
+
+    async def reverse_remove(self, remote: str):
+        self.calls.append("reverse_remove")
+
+
+def test_push_failure_closes_tunnel(tmp_path: pathlib.Path):
+    server_path = tmp_path / "scrcpy-server"
+    server_path.write_bytes(b"jar")
+    params = symmetrical_doodle.servers.create_server_params(str(server_path))
+    params.server_path = server_path
+    adb = FailingPushADB()
+    tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, "scrcpy")  # type: ignore
+    server = symmetrical_doodle.servers.Server(params, adb, tunnel)  # type: ignore
+
+    async def main():
+        with pytest.raises(OSError):
+            await server.run()
+
+    asyncio.run(main())
+    assert adb.calls == ["reverse", "reverse_remove"]
+    assert tunnel.forward is None
+
+
+class FakeProcess:
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_eof()
+
+    async def wait(self):
+        return 0
+
+
+class DeviceADB:
+    """Connects like a device server through the reverse tunnel."""
+
+    def __init__(self, tunnel: symmetrical_doodle.adb_tunnel.Tunnel):
+        self.tunnel = tunnel
+        self.calls: list[str] = []
+        self.writers: list[asyncio.StreamWriter] = []
+
+    async def push(self, locals: list[str], remote: str):
+        return FakeProcess()
+
+    async def run_command(self, command: list[str], stdout=None):
+        assert self.tunnel.local_port is not None
+        _, writer = await asyncio.open_connection("127.0.0.1", self.tunnel.local_port)
+        writer.write(
+            b"device".ljust(
+                symmetrical_doodle.servers.DEVICE_NAME_FIELD_LENGTH, b"\x00"
+            )
+        )
+        self.writers.append(writer)
+        return FakeProcess()
+
+    async def reverse(self, remote: str, local: str):
+        self.calls.append("reverse")
+
+    async def reverse_remove(self, remote: str):
+        self.calls.append("reverse_remove")
+
+
+def test_server_keeps_tunnel(tmp_path: pathlib.Path):
+    server_path = tmp_path / "scrcpy-server"
+    server_path.write_bytes(b"jar")
+    params = symmetrical_doodle.servers.create_server_params(
+        str(server_path), control=False
+    )
+    params.server_path = server_path
+    tunnel = symmetrical_doodle.adb_tunnel.Tunnel(None, "scrcpy")  # type: ignore
+    adb = DeviceADB(tunnel)
+    tunnel.adb = adb  # type: ignore
+    server = symmetrical_doodle.servers.Server(
+        params, adb, tunnel, keep_tunnel=True  # type: ignore
+    )
+
+    async def main():
+        # a reconnection reuses the reverse
+        for _ in range(2):
+            await server.run()
+            assert server.info == symmetrical_doodle.servers.ServerInfo(b"device")
+            await server.close()
+        assert adb.calls == ["reverse"]
+
+        await server.close_tunnel()
+        assert adb.calls == ["reverse", "reverse_remove"]
+        for writer in adb.writers:
+            writer.close()
+
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+import asyncio
+import pathlib
+import queue
+
+import symmetrical_doodle.adb.sockets
+import symmetrical_doodle.adb_tunnel
+import symmetrical_doodle.android.input
+import symmetrical_doodle.android.keycodes
+import symmetrical_doodle.control_message
+import symmetrical_doodle.controllers
+import symmetrical_doodle.demuxers
+import symmetrical_doodle.packet_queues
+import symmetrical_doodle.packets
+import symmetrical_doodle.servers
+import symmetrical_doodle.sessions
+import symmetrical_doodle.shards
+import symmetrical_doodle.shared_frames
+
+
+class FakeADB(symmetrical_doodle.adb.sockets.SocketADB):
+    started: int = 0
+
+    async def start_server(self):
+        self.started += 1
+        return symmetrical_doodle.adb.sockets.FinishedProcess()
+
+
+class FakeServer(symmetrical_doodle.servers.Server):
+    """Streams a video header and ends the stream, like a device which is
+    disconnected right after the start."""
+
+    async def run(self):
+        if self.adb.serial == "broken":
+            raise ConnectionError
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            writer.write(
+                symmetrical_doodle.demuxers.CodecID.H264.value.to_bytes(4, "big")
+                + (1920).to_bytes(4, "big")
+                + (1080).to_bytes(4, "big")
+            )
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+
+        server = await asyncio.start_server(handle, host="127.0.0.1", port=0)
+        port = server.sockets[0].getsockname()[1]
+        self.video_connection = await asyncio.open_connection("127.0.0.1", port)
+        server.close()
+
+
+class FakeSession(symmetrical_doodle.sessions.Session):
+    def create_server(self):
+        adb = symmetrical_doodle.adb.sockets.SocketADB(program="adb")
+        adb.serial = self.serial
+        tunnel = symmetrical_doodle.adb_tunnel.Tunnel(adb, self.device_socket_name)
+        return FakeServer(self.params, adb, tunnel)
+
+
+def test_failures_are_isolated():
+    params = symmetrical_doodle.servers.create_server_params("scrcpy-server")
+    params.server_path = pathlib.Path("scrcpy-server")
+
+    async def main():
+        adb = FakeADB(program="adb")
+        manager = symmetrical_doodle.sessions.SessionManager(adb=adb)
+        queues: list[asyncio.Queue[symmetrical_doodle.packet_queues.Item]] = []
+        for serial in ["a", "broken", "b"]:
+            session = manager.add(FakeSession(params, serial))
+            queue: asyncio.Queue[symmetrical_doodle.packet_queues.Item] = (
+                asyncio.Queue()
+            )
+            session.packet_sinks.append(queue)
+            queues.append(queue)
+        await asyncio.wait_for(manager.run(), 1)
+        # the adb server is started once for all the sessions
+        assert adb.started == 1
+        return manager, queues
+
+    manager, queues = asyncio.run(main())
+    assert [session.serial for session in manager.failed()] == ["broken"]
+    assert isinstance(manager.sessions[1].exception, ConnectionError)
+    assert not manager.sessions[1].started.is_set()
+    for i in (0, 2):
+        session = manager.sessions[i]
+        assert session.started.is_set()
+        assert session.exception is None
+        # closed once the stream ended
+        assert session.server is not None
+        assert session.server.video_connection is None
+        assert isinstance(
+            queues[i].get_nowait(), symmetrical_doodle.packets.VideoCodecContext
+        )
+        assert isinstance(
+            queues[i].get_nowait(), symmetrical_doodle.packets.EndOfStream
+        )
+
+
+def test_split():
+    serials = ["a", "b", "c", "d", "e"]
+    assert symmetrical_doodle.shards.split(serials, 2) == [["a", "c", "e"], ["b", "d"]]
+    assert symmetrical_doodle.shards.split(serials[:1], 4) == [["a"]]
+
+
+class FailingWriter(symmetrical_doodle.shared_frames.SharedFrameWriter):
+    async def run(self):
+        # like a frame larger than a slot
+        raise AssertionError
+
+
+def test_shard_reports_writer_failure():
+    params = symmetrical_doodle.servers.create_server_params("scrcpy-server")
+    params.server_path = pathlib.Path("scrcpy-server")
+    ring = symmetrical_doodle.shared_frames.SharedFrameRing.create(16)
+    statuses: queue.Queue[symmetrical_doodle.shards.StatusUpdate] = queue.Queue()
+
+    async def main():
+        shard = symmetrical_doodle.shards.Shard(
+            params, {}, queue.Queue(), statuses  # type: ignore
+        )
+        session = shard.manager.add(FakeSession(params, "a"))
+        await asyncio.wait_for(shard.run_session(session, FailingWriter(ring)), 1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        ring.unlink()
+    updates: list[symmetrical_doodle.shards.StatusUpdate] = []
+    while not statuses.empty():
+        updates.append(statuses.get_nowait())
+    assert updates[0].status == symmetrical_doodle.shards.Status.STARTING
+    assert updates[-1].status == symmetrical_doodle.shards.Status.FAILED
+    assert "AssertionError" in updates[-1].detail
+
+
+def test_shard_rejects_commands_when_full():
+    params = symmetrical_doodle.servers.create_server_params("scrcpy-server")
+    params.server_path = pathlib.Path("scrcpy-server")
+    commands: queue.Queue[symmetrical_doodle.shards.Command | None] = queue.Queue()
+    message = symmetrical_doodle.control_message.InjectKeycode(
+        symmetrical_doodle.android.input.KeyEventAction.AKEY_EVENT_ACTION_DOWN,
+        symmetrical_doodle.android.keycodes.Keycode.AKEYCODE_A,
+        0,
+        0,
+    )
+    count = 300
+    for _ in range(count):
+        commands.put(symmetrical_doodle.shards.Command("a", message))
+    commands.put(None)
+
+    async def main():
+        shard = symmetrical_doodle.shards.Shard(
+            params, {}, commands, queue.Queue()  # type: ignore
+        )
+        session = shard.manager.add(FakeSession(params, "a"))
+        # not running, nothing is taken from the queue
+        session.controller = symmetrical_doodle.controllers.Controller(
+            (asyncio.StreamReader(), None)  # type: ignore
+        )
+        await asyncio.wait_for(shard.receive_commands(), 1)
+        return shard, session.controller
+
+    shard, controller = asyncio.run(main())
+    assert controller.queue.qsize() + shard.rejected == count
+    assert shard.rejected > 0
@@ -0,0 +1,88 @@
+import asyncio
+
+import av
+import numpy
+import pytest
+
+import symmetrical_doodle.shared_frames
+
+
+def create_frame(width: int, height: int, pts: int):
+    rng = numpy.random.default_rng(pts)
+    image = rng.integers(0, 256, (height, width, 3), numpy.uint8)
+    frame = av.VideoFrame.from_ndarray(image, format="rgb24").reformat(format="yuv420p")
+    frame.pts = pts
+    return frame
+
+
+async def wait_for_sequence(
+    ring: symmetrical_doodle.shared_frames.SharedFrameRing, sequence: int
+):
+    async def poll():
+        while ring.get_latest_sequence() < sequence:
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(poll(), 1)
+
+
+def test_write_and_read():
+    frames = [create_frame(30, 20, pts) for pts in range(0, 5000, 1000)]
+
+    ring = symmetrical_doodle.shared_frames.SharedFrameRing.create(64 * 64 * 3, 2)
+    reader = symmetrical_doodle.shared_frames.SharedFrameRing.attach(ring.name)
+    try:
+        assert (reader.slot_count, reader.slot_capacity) == (2, 64 * 64 * 3)
+        assert reader.latest() is None
+
+        writer = symmetrical_doodle.shared_frames.SharedFrameWriter(ring, "bgr24")
+
+        async def main():
+            await writer.write(frames[0])
+            view = reader.latest()
+            assert view is not None
+            assert (view.sequence, view.pts, view.format) == (1, 0, "bgr24")
+            assert (view.width, view.height) == (30, 20)
+            expected = frames[0].to_ndarray(format="bgr24")
+            assert numpy.array_equal(view.image, expected)
+
+            await writer.write(frames[1])
+            assert view.valid()
+            # the writer wraps around the ring and reuses the slot
+            await writer.write(frames[2])
+            assert not view.valid()
+
+            task = asyncio.create_task(writer.run())
+            for sequence, frame in enumerate(frames[3:], 4):
+                await writer.put(frame)
+                await wait_for_sequence(reader, sequence)
+            task.cancel()
+            del view
+
+        asyncio.run(main())
+
+        image = reader.read()
+        assert image is not None
+        assert numpy.array_equal(image, frames[-1].to_ndarray(format="bgr24"))
+    finally:
+        reader.close()
+        ring.close()
+        ring.unlink()
+
+
+def test_close_with_views():
+    ring = symmetrical_doodle.shared_frames.SharedFrameRing.create(64 * 64 * 3, 2)
+    writer = symmetrical_doodle.shared_frames.SharedFrameWriter(ring)
+    try:
+        reader = symmetrical_doodle.shared_frames.SharedFrameRing.attach(ring.name)
+        asyncio.run(writer.write(create_frame(30, 20, 0)))
+        view = reader.latest()
+        assert view is not None
+        # the view still maps the shared memory
+        with pytest.raises(BufferError):
+            reader.close()
+        del view
+        reader.close()
+    finally:
+        writer.close()
+        ring.close()
+        ring.unlink()
@@ -0,0 +1,29 @@
+import asyncio
+
+import symmetrical_doodle.tasks
+
+
+def test_watermark():
+    async def main():
+        watermark = symmetrical_doodle.tasks.Watermark()
+        sequences = [watermark.next() for _ in range(4)]
+        assert sequences == [1, 2, 3, 4]
+
+        waiter = asyncio.create_task(watermark.wait(3))
+        watermark.complete(2)
+        watermark.complete(3)
+        await asyncio.sleep(0)
+        assert watermark.value == 0
+        assert not waiter.done()
+
+        # completed out of order, the watermark jumps over 2 and 3
+        watermark.complete(1)
+        assert watermark.value == 3
+        await asyncio.wait_for(waiter, 1)
+
+        await watermark.wait(2)
+        watermark.complete(4)
+        assert watermark.value == 4
+        assert not watermark.ahead
+
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+import concurrent.futures
+import json
+import time
+
+import symmetrical_doodle.tracing
+
+
+def test_tracer_report():
+    tracer = symmetrical_doodle.tracing.Tracer()
+    with tracer.span("push"):
+        time.sleep(0.01)
+    with tracer.span("tunnel"):
+        with tracer.span("execute"):
+            pass
+    tracer.mark_once("first frame")
+    tracer.mark_once("first frame")
+
+    report = json.loads(tracer.dumps())
+    assert [span["name"] for span in report["spans"]] == ["push", "tunnel", "execute"]
+    push, tunnel, execute = report["spans"]
+    assert push["duration"] >= 10
+    assert push["end"] <= tunnel["start"] <= execute["start"]
+    assert execute["end"] <= tunnel["end"]
+    [mark] = report["marks"]
+    assert mark["name"] == "first frame"
+    assert mark["time"] >= tunnel["end"]
+
+
+def test_mark_once_from_threads():
+    tracer = symmetrical_doodle.tracing.Tracer()
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        for _ in range(1000):
+            executor.submit(tracer.mark_once, "first frame")
+    assert [mark.name for mark in tracer.marks] == ["first frame"]
+
+
+def test_no_tracer():
+    with symmetrical_doodle.tracing.span(None, "push"):
+        pass
+    symmetrical_doodle.tracing.mark_once(None, "first frame")